@@ -0,0 +1,224 @@
+# analysis_worker.py
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Optional, Set, Tuple
+import crud, llm_service
+from llm_providers import is_rate_limited
+from database import async_session_local
+from rate_limit import AdaptiveConcurrency, estimate_tokens, llm_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Initial and maximum number of LLM analyses running at once in this process; the
+# limit adapts between 1 and the maximum depending on rate-limit responses
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "16"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "5"))
+ANALYSIS_RETRY_BASE_SECONDS = float(os.getenv("ANALYSIS_RETRY_BASE_SECONDS", "5"))
+ANALYSIS_RETRY_MAX_SECONDS = float(os.getenv("ANALYSIS_RETRY_MAX_SECONDS", "300"))
+# How often the queue is polled when nobody signals new work
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", "5"))
+# A job still "running" after this long is assumed abandoned and claimed again
+ANALYSIS_LEASE_SECONDS = float(os.getenv("ANALYSIS_LEASE_SECONDS", "300"))
+# How often GET /interviews/{id}/analysis/stream checks on an analysis another worker is running
+ANALYSIS_STREAM_POLL_SECONDS = float(os.getenv("ANALYSIS_STREAM_POLL_SECONDS", "2"))
+# ...and for how long at most; by default long enough for an abandoned job's lease to expire
+ANALYSIS_STREAM_WAIT_SECONDS = float(os.getenv("ANALYSIS_STREAM_WAIT_SECONDS", str(2 * ANALYSIS_LEASE_SECONDS)))
+ANALYSIS_STREAM_KEEPALIVE_SECONDS = float(os.getenv("ANALYSIS_STREAM_KEEPALIVE_SECONDS", "15"))
+# Set to false when analyses are processed by a separate `python analysis_worker.py` process
+ANALYSIS_WORKER_IN_PROCESS = os.getenv("ANALYSIS_WORKER_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff, jittered to between half and all of the step, for the given (1-based) attempt."""
+    ceiling = min(ANALYSIS_RETRY_MAX_SECONDS, ANALYSIS_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class AnalysisWorker:
+    """Runs queued interview analyses from the interviews table with bounded concurrency.
+
+    The interviews table is the queue: jobs are claimed with SKIP LOCKED, so any
+    number of API processes and standalone workers can share it.
+    """
+
+    def __init__(self, concurrency: int = ANALYSIS_CONCURRENCY, max_concurrency: int = ANALYSIS_MAX_CONCURRENCY):
+        self.concurrency = AdaptiveConcurrency(concurrency, maximum=max(concurrency, max_concurrency))
+        self.in_flight: Set[asyncio.Task] = set()
+        self.wakeup: Optional[asyncio.Event] = None  # created on the serving event loop
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """Wakes the worker up early, e.g. right after a new interview was queued."""
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run_forever(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            self.wakeup.clear()
+            free_slots = self.concurrency.limit - len(self.in_flight)
+            claimed = []
+            if free_slots > 0:
+                try:
+                    async with async_session_local() as db:
+                        claimed = await crud.claim_pending_analyses(db, free_slots, ANALYSIS_LEASE_SECONDS)
+                except Exception as e:
+                    logger.error("Failed to claim interview analyses: %s", e)
+                for interview_id, interview_text, attempts in claimed:
+                    task = asyncio.create_task(self._process(interview_id, interview_text, attempts))
+                    self.in_flight.add(task)
+                    task.add_done_callback(self._on_done)
+            if claimed and len(claimed) == free_slots:
+                continue  # the queue may hold more work; claim again once a slot frees up
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=ANALYSIS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, task: asyncio.Task):
+        self.in_flight.discard(task)
+        self.notify()
+
+    async def _process(
+        self, interview_id, interview_text: str, attempts: int,
+        on_event: Optional[Callable[[str, Any], None]] = None,
+    ):
+        """Analyzes and stores one claimed interview. With `on_event` the completion is
+        streamed and reported as ("partial", (path, value)) events, then ("done", analysis)
+        once stored or ("error", message).
+        """
+        try:
+            await llm_rate_limiter.acquire(estimate_tokens(interview_text))
+            if on_event is None:
+                analysis_result = await llm_service.analyze_interview_text(interview_text or "")
+            else:
+                async for path, value in llm_service.stream_interview_analysis(interview_text or ""):
+                    if path:
+                        on_event("partial", (path, value))
+                    else:
+                        analysis_result = value
+            self.concurrency.on_success()
+        except Exception as e:
+            if is_rate_limited(e):
+                self.concurrency.on_rate_limited()
+            retry_in = retry_delay(attempts) if attempts < ANALYSIS_MAX_ATTEMPTS else None
+            if on_event is not None:
+                on_event("error", f"Analysis failed: {e}")
+            try:
+                async with async_session_local() as db:
+                    await crud.fail_analysis(db, interview_id, str(e), retry_in)
+            except Exception as db_error:
+                # The lease expires and the job is retried
+                logger.error("Failed to record analysis failure for interview %s: %s", interview_id, db_error)
+            return
+        try:
+            async with async_session_local() as db:
+                await crud.complete_analysis(db, interview_id, analysis_result)
+        except Exception as e:
+            logger.error("Failed to store analysis for interview %s: %s", interview_id, e)
+            if on_event is not None:
+                on_event("error", f"Failed to store the analysis: {e}")
+            return
+        if on_event is not None:
+            on_event("done", analysis_result.model_dump())
+
+    def run_now(self, job: tuple, on_event: Callable[[str, Any], None]):
+        """Runs a job claimed with crud.claim_analysis right away, streaming its events.
+
+        The job runs as a task of the worker, so it completes and is stored even if
+        whoever asked for it stops listening.
+        """
+        task = asyncio.create_task(self._process(*job, on_event=on_event))
+        self.in_flight.add(task)
+        task.add_done_callback(self._on_done)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # Jobs still in flight stay "running" and are re-claimed after the lease expires
+        for task in list(self.in_flight):
+            task.cancel()
+
+
+worker = AnalysisWorker()
+
+
+def _partial_event(path: tuple, value) -> Tuple[str, dict]:
+    if len(path) == 2 and path[0] == "assessment_aspects":
+        return "aspect", {"aspect": path[1], "rating": value}
+    if len(path) == 2:
+        return "item", {"field": path[0], "index": path[1], "value": value}
+    return "field", {"field": path[0], "value": value}
+
+async def stream_analysis(interview_id, refresh: bool = False) -> AsyncIterator[Tuple[str, Any]]:
+    """Analyzes an interview now and yields (event, data) as the analysis arrives.
+
+    Events: "status", then "item" (a strengths / weaknesses / red flag entry),
+    "aspect" (one assessment rating) and "field" (a complete field) as they are
+    parsed from the streamed completion, and finally "done" with the stored
+    analysis or "error". ("keepalive", None) is yielded while nothing happens.
+    A finished analysis is replayed from the database unless `refresh` is set; one
+    that another worker is running is waited for, up to ANALYSIS_STREAM_WAIT_SECONDS.
+    """
+    last_status = None
+    deadline = time.monotonic() + ANALYSIS_STREAM_WAIT_SECONDS
+    while True:
+        async with async_session_local() as db:
+            job = await crud.claim_analysis(db, interview_id, ANALYSIS_LEASE_SECONDS, refresh)
+            interview = None if job else await crud.get_interview_by_id(db, interview_id)
+            status = interview.analysis_status if interview else None
+            analysis = interview.interview_analysis if interview else None
+        if job:
+            break
+        if interview is None:
+            yield "error", {"detail": "Interview not found."}
+            return
+        if status == crud.ANALYSIS_DONE:
+            for field, value in (analysis or {}).items():
+                yield "field", {"field": field, "value": value}
+            yield "done", analysis
+            return
+        if time.monotonic() >= deadline:
+            yield "error", {"detail": f"Analysis still {status} after {ANALYSIS_STREAM_WAIT_SECONDS:.0f}s; try again later."}
+            return
+        if status != last_status:
+            yield "status", {"analysis_status": status}
+            last_status = status
+        else:
+            yield "keepalive", None
+        # Running elsewhere: wait for it, or claim it if it goes back to pending
+        await asyncio.sleep(ANALYSIS_STREAM_POLL_SECONDS)
+
+    events: asyncio.Queue = asyncio.Queue()
+    worker.run_now(job, lambda kind, data: events.put_nowait((kind, data)))
+    yield "status", {"analysis_status": crud.ANALYSIS_RUNNING}
+    while True:
+        try:
+            kind, data = await asyncio.wait_for(events.get(), ANALYSIS_STREAM_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield "keepalive", None
+            continue
+        if kind == "partial":
+            yield _partial_event(*data)
+        elif kind == "error":
+            yield "error", {"detail": data}
+            return
+        else:
+            yield kind, data
+            return
+
+
+if __name__ == "__main__":
+    asyncio.run(worker.run_forever())
@@ -0,0 +1,156 @@
+# batch_analysis.py
+"""Re-analyzes many interviews directly, e.g. after a prompt change.
+
+    python batch_analysis.py --vacancy-id <uuid> --checkpoint reanalysis.ckpt
+    python batch_analysis.py --interview-ids <uuid> <uuid> ...
+
+Calls go through a requests/tokens-per-minute limiter with adaptive
+concurrency, and bypass the LLM response cache: a re-analysis always asks the
+model again. Results are written back in bulk, and the IDs of stored analyses are
+appended to the checkpoint file, so an interrupted run resumes where it stopped.
+The API equivalent is POST /interviews/batch-analysis, which re-queues the
+interviews for the analysis worker instead.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from typing import List, Optional, Set
+from sqlalchemy import select
+import crud, llm_service, models
+from llm_providers import is_rate_limited
+from database import async_session_local
+from rate_limit import AdaptiveConcurrency, RateLimiter, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+BATCH_FLUSH_SIZE = int(os.getenv("BATCH_ANALYSIS_FLUSH_SIZE", "50"))
+BATCH_MAX_ATTEMPTS = 5
+
+def load_checkpoint(path: Optional[str]) -> Set[uuid.UUID]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {uuid.UUID(line.strip()) for line in f if line.strip()}
+
+def append_checkpoint(path: Optional[str], interview_ids: List[uuid.UUID]):
+    if not path:
+        return
+    with open(path, "a") as f:
+        f.writelines(f"{interview_id}\n" for interview_id in interview_ids)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+async def run_batch(
+    interview_ids: Optional[List[uuid.UUID]] = None,
+    vacancy_id: Optional[uuid.UUID] = None,
+    checkpoint_path: Optional[str] = None,
+    limiter: Optional[RateLimiter] = None,
+    initial_concurrency: int = 4,
+    max_concurrency: int = 32,
+    flush_size: int = BATCH_FLUSH_SIZE,
+) -> dict:
+    limiter = limiter or RateLimiter()
+    concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+    completed = load_checkpoint(checkpoint_path)
+
+    query = select(models.Interview.id, models.Interview.interview_text).order_by(models.Interview.id)
+    if interview_ids:
+        query = query.where(models.Interview.id.in_(interview_ids))
+    if vacancy_id:
+        query = query.where(models.Interview.vacancy_id == vacancy_id)
+    async with async_session_local() as db:
+        rows = (await db.execute(query)).all()
+    jobs = [(row.id, row.interview_text) for row in rows if row.id not in completed]
+
+    pending_results = []
+    stats = {"total": len(jobs), "skipped_from_checkpoint": len(rows) - len(jobs), "done": 0, "failed": 0}
+    in_flight: Set[asyncio.Task] = set()
+    flush_lock = asyncio.Lock()
+
+    async def flush():
+        async with flush_lock:
+            if not pending_results:
+                return
+            batch = pending_results[:]
+            async with async_session_local() as db:
+                await crud.store_analyses(db, batch)
+            # Dropped only once stored: if the write fails, the batch stays pending and the run fails
+            del pending_results[:len(batch)]
+            append_checkpoint(checkpoint_path, [interview_id for interview_id, _ in batch])
+            stats["done"] += len(batch)
+            logger.info("Stored %d/%d analyses (concurrency %d)", stats["done"], stats["total"], concurrency.limit)
+
+    async def analyze(interview_id, interview_text):
+        for attempt in range(1, BATCH_MAX_ATTEMPTS + 1):
+            await limiter.acquire(estimate_tokens(interview_text))
+            try:
+                analysis_result = await llm_service.analyze_interview_text(interview_text or "", refresh=True)
+            except Exception as e:
+                if is_rate_limited(e):
+                    concurrency.on_rate_limited()
+                else:
+                    logger.warning("Interview %s: attempt %d failed: %s", interview_id, attempt, e)
+                await asyncio.sleep(min(60, 2 ** attempt))
+                continue
+            concurrency.on_success()
+            pending_results.append((interview_id, analysis_result))
+            if len(pending_results) >= flush_size:
+                await flush()
+            return
+        logger.error("Interview %s: giving up after %d attempts", interview_id, BATCH_MAX_ATTEMPTS)
+        stats["failed"] += 1
+
+    async def wait(return_when=asyncio.ALL_COMPLETED) -> Set[asyncio.Task]:
+        done, pending = await asyncio.wait(in_flight, return_when=return_when)
+        for task in done:
+            task.result()  # Raises a failed write
+        return pending
+
+    try:
+        for interview_id, interview_text in jobs:
+            while len(in_flight) >= concurrency.limit:
+                in_flight = await wait(asyncio.FIRST_COMPLETED)
+            in_flight.add(asyncio.create_task(analyze(interview_id, interview_text)))
+        if in_flight:
+            in_flight = await wait()
+        await flush()
+    finally:
+        for task in in_flight:
+            task.cancel()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run LLM analysis for many interviews.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--vacancy-id", type=uuid.UUID)
+    target.add_argument("--interview-ids", type=uuid.UUID, nargs="+")
+    parser.add_argument("--checkpoint", help="File recording finished interview IDs, used to resume.")
+    parser.add_argument("--requests-per-minute", type=float, default=None)
+    parser.add_argument("--tokens-per-minute", type=float, default=None)
+    parser.add_argument("--concurrency", type=int, default=4, help="Initial concurrency.")
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    limiter_kwargs = {}
+    if args.requests_per_minute:
+        limiter_kwargs["requests_per_minute"] = args.requests_per_minute
+    if args.tokens_per_minute:
+        limiter_kwargs["tokens_per_minute"] = args.tokens_per_minute
+    stats = asyncio.run(run_batch(
+        interview_ids=args.interview_ids,
+        vacancy_id=args.vacancy_id,
+        checkpoint_path=args.checkpoint,
+        limiter=RateLimiter(**limiter_kwargs),
+        initial_concurrency=args.concurrency,
+        max_concurrency=args.max_concurrency,
+    ))
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# bench/datagen.py
+"""Fills the database pointed to by DATABASE_URL with synthetic benchmark data.
+
+    python -m bench.datagen --candidates 100000 --vacancies 500 --interviews 20000 --reset
+    python -m semantic_index --build
+
+Skills follow a Zipf-like distribution (a few very common skills, a long tail of
+rare ones), experience is log-normally distributed, and interviews carry a
+completed analysis so the read paths have realistic payloads.
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert, text
+import models
+from skill_vocabulary import vocabulary
+import vacancy_stats
+import embeddings
+import candidate_dedup
+import schema
+from database import dispose_engine, get_engine
+
+SKILLS = [
+    "Python", "SQL", "Git", "Docker", "Linux", "JavaScript", "PostgreSQL", "FastAPI", "Django", "Flask",
+    "React", "TypeScript", "Kubernetes", "AWS", "GCP", "Azure", "Redis", "Kafka", "RabbitMQ", "Celery",
+    "Pandas", "NumPy", "Scikit-learn", "PyTorch", "TensorFlow", "Airflow", "Spark", "Hadoop", "ClickHouse", "MongoDB",
+    "Go", "Java", "Kotlin", "C++", "C#", ".NET", "Rust", "Scala", "PHP", "Laravel",
+    "Node.js", "Vue.js", "Angular", "HTML", "CSS", "GraphQL", "REST", "gRPC", "Terraform", "Ansible",
+    "CI/CD", "Jenkins", "GitLab CI", "Prometheus", "Grafana", "Elasticsearch", "Nginx", "Bash", "Tableau", "Power BI",
+    "Excel", "Figma", "Jira", "Agile", "Scrum", "Microservices", "OOP", "TDD", "Selenium", "Pytest",
+]
+ROLES = [
+    "Python Developer", "Backend Developer", "Frontend Developer", "Fullstack Developer", "Data Analyst",
+    "Data Scientist", "Data Engineer", "DevOps Engineer", "QA Engineer", "ML Engineer",
+    "Java Developer", "Go Developer", "System Administrator", "Product Analyst", "Team Lead",
+]
+SENIORITY = ["Junior", "Middle", "Senior", "Lead", ""]
+EXPERIENCE_REQUIREMENTS = ["1-3 years", "3-6 years", "6+ years", "2 years", None]
+RATINGS = ["Excellent", "Good", "Needs Improvement", "Not Assessed"]
+ASPECTS = [
+    "Core Technical Skills", "Problem-Solving Ability", "Past Project Experience", "Technical Depth",
+    "Communication & Clarity", "Motivation & Drive", "Team Collaboration & Attitude", "Reliability & Ownership",
+]
+PHRASES = [
+    "Candidate described a migration of a monolith to microservices.",
+    "Explained indexing strategies in PostgreSQL in detail.",
+    "Was late to the interview and seemed unprepared.",
+    "Showed strong ownership of production incidents.",
+    "Struggled with basic algorithmic questions.",
+    "Communicates clearly and asks good clarifying questions.",
+    "Has led a team of four engineers for two years.",
+    "Unclear about reliability practices and on-call rotation.",
+]
+
+# Zipf-like weights: the k-th most common skill is ~1/k as frequent as the first
+SKILL_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(SKILLS))]
+
+def sample_skills(rng: random.Random, low: int, high: int):
+    count = rng.randint(low, high)
+    chosen = set()
+    while len(chosen) < count:
+        chosen.add(rng.choices(SKILLS, weights=SKILL_WEIGHTS)[0])
+    return sorted(chosen)
+
+def candidate_row(rng: random.Random):
+    months = int(min(360, rng.lognormvariate(3.7, 0.7)))
+    role = f"{rng.choice(SENIORITY)} {rng.choice(ROLES)}".strip()
+    skills, skill_ids = vocabulary.canonicalize(sample_skills(rng, 3, 15))
+    summary = " ".join(rng.sample(PHRASES, 2))
+    experience = [{"company": f"Company {rng.randint(1, 5000)}", "position": role, "months": months}]
+    embedder = embeddings.get_embedder()
+    row = {
+        "id": uuid.uuid4(),
+        "name": role,
+        "email": None,
+        "summary": summary,
+        "skills": skills,
+        "skill_ids": skill_ids,
+        "embedding": embeddings.to_bytes(embedder.embed([embeddings.candidate_text(role, summary, skills, experience)])[0]),
+        "embedding_model": embedder.name,
+        "experience": experience,
+        "education": [{"name": f"University {rng.randint(1, 300)}", "year": rng.randint(1995, 2024)}],
+        "main_url": f"https://hh.ru/resume/{uuid.uuid4().hex}",
+        "total_experience_months": months,
+        "status": "New",
+    }
+    row.update(candidate_dedup.fingerprints(row))
+    return row
+
+def vacancy_row(rng: random.Random, index: int):
+    skills, skill_ids = vocabulary.canonicalize(sample_skills(rng, 4, 10))
+    return {
+        "id": uuid.uuid4(),
+        "title": f"{rng.choice(SENIORITY)} {rng.choice(ROLES)}".strip(),
+        "published_date": date.today() - timedelta(days=rng.randint(0, 365)),
+        "responsibilities": rng.sample(PHRASES, 3),
+        "requirements_experience": rng.choice(EXPERIENCE_REQUIREMENTS),
+        "requirements_skills": skills,
+        "requirement_skill_ids": skill_ids,
+        "status": "Open",
+        "external_id": f"bench-{index}",
+    }
+
+def interview_row(rng: random.Random, candidate_id, vacancy_id):
+    return {
+        "id": uuid.uuid4(),
+        "candidate_id": candidate_id,
+        "vacancy_id": vacancy_id,
+        "interview_name": "Technical interview",
+        "interview_date": datetime.now() - timedelta(days=rng.randint(0, 180)),
+        "interview_text": " ".join(rng.choices(PHRASES, k=rng.randint(5, 30))),
+        "interview_analysis": {
+            "strengths": rng.sample(PHRASES, 2),
+            "weaknesses": rng.sample(PHRASES, 1),
+            "assessment_aspects": {aspect: rng.choice(RATINGS) for aspect in ASPECTS},
+            "red_flags_identified": rng.sample(PHRASES, rng.randint(0, 2)),
+            "overall_score": rng.randint(0, 100),
+        },
+        "analysis_status": "done",
+        "analysis_attempts": 1,
+    }
+
+
+async def insert_rows(conn, table, rows_iter, total: int, chunk_size: int):
+    chunk = []
+    written = 0
+    for row in rows_iter:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            await conn.execute(insert(table), chunk)
+            written += len(chunk)
+            chunk = []
+            print(f"  {table.name}: {written}/{total}", end="\r", flush=True)
+    if chunk:
+        await conn.execute(insert(table), chunk)
+        written += len(chunk)
+    print(f"  {table.name}: {written}/{total}")
+
+
+async def generate(candidates: int, vacancies: int, interviews: int, seed: int, reset: bool, chunk_size: int):
+    rng = random.Random(seed)
+    await schema.upgrade()
+    if reset:
+        async with get_engine().begin() as conn:
+            await conn.execute(text("TRUNCATE interviews, candidates, vacancies CASCADE"))
+
+    vacancy_rows = [vacancy_row(rng, i) for i in range(vacancies)]
+    candidate_ids = []
+
+    def candidate_rows():
+        for _ in range(candidates):
+            row = candidate_row(rng)
+            candidate_ids.append(row["id"])
+            yield row
+
+    async with get_engine().begin() as conn:
+        await insert_rows(conn, models.Vacancy.__table__, iter(vacancy_rows), vacancies, chunk_size)
+    async with get_engine().begin() as conn:
+        await insert_rows(conn, models.Candidate.__table__, candidate_rows(), candidates, chunk_size)
+    if interviews and candidate_ids and vacancy_rows:
+        vacancy_ids = [row["id"] for row in vacancy_rows]
+        rows = (interview_row(rng, rng.choice(candidate_ids), rng.choice(vacancy_ids)) for _ in range(interviews))
+        async with get_engine().begin() as conn:
+            await insert_rows(conn, models.Interview.__table__, rows, interviews, chunk_size)
+    async with get_engine().begin() as conn:
+        await conn.execute(text("ANALYZE candidates"))
+        await conn.execute(text("ANALYZE vacancies"))
+        await conn.execute(text("ANALYZE interviews"))
+    # Interviews were inserted directly, so their stats counters are built from scratch
+    await vacancy_stats.rebuild()
+    await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark data.")
+    parser.add_argument("--candidates", type=int, default=10000)
+    parser.add_argument("--vacancies", type=int, default=200)
+    parser.add_argument("--interviews", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--reset", action="store_true", help="Truncate the tables first.")
+    args = parser.parse_args()
+    asyncio.run(generate(args.candidates, args.vacancies, args.interviews, args.seed, args.reset, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# bench/run.py
+"""Latency/throughput benchmark for the API hot paths.
+
+    python -m bench.datagen --candidates 100000 --reset
+    python -m bench.run --requests 500 --concurrency 20 --save-baseline bench/baselines/main.json
+    python -m bench.run --requests 500 --concurrency 20 --compare bench/baselines/main.json
+
+By default the app runs in-process over an ASGI transport with OpenAI replaced by
+a stub (--llm-latency seconds per call), against the database in DATABASE_URL.
+With --base-url the requests go to an already running server instead.
+Reports p50/p95/p99 latency and throughput per endpoint; --compare exits with
+status 1 when any endpoint's p95 regressed by more than --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+import httpx
+import numpy as np
+
+SKILL_QUERIES = ["Python", "SQL", "Python,Docker", "React,TypeScript", "Go,Kubernetes", "Pandas,SQL,Airflow"]
+ROLE_QUERIES = [None, "Developer", "Analyst", "Senior"]
+DESCRIPTIONS = [
+    "Looking for a senior backend developer with Python, FastAPI and PostgreSQL, 5+ years",
+    "Data analyst who knows SQL and Tableau, 2-4 years",
+    "DevOps engineer, Kubernetes, Terraform, AWS, 3-5 years",
+]
+
+
+async def fetch_ids(client: httpx.AsyncClient) -> Dict[str, List[str]]:
+    """Picks existing vacancy and candidate IDs to parametrize the ID-based endpoints."""
+    vacancies = await client.get("/vacancies")
+    vacancy_ids = [v["id"] for v in vacancies.json()][:200] if vacancies.status_code == 200 else []
+    candidates = await client.get("/candidates/search", params={"limit": 200})
+    candidate_ids = [c["id"] for c in candidates.json()] if candidates.status_code == 200 else []
+    return {"vacancies": vacancy_ids, "candidates": candidate_ids}
+
+
+def scenarios(ids: Dict[str, List[str]]) -> Dict[str, Callable[[httpx.AsyncClient], "asyncio.Future"]]:
+    rng = random.Random(7)
+
+    def search(client):
+        params = {"skills": rng.choice(SKILL_QUERIES), "limit": 50}
+        role = rng.choice(ROLE_QUERIES)
+        if role:
+            params["role"] = role
+        return client.get("/candidates/search", params=params)
+
+    def list_vacancies(client):
+        return client.get("/vacancies")
+
+    def list_vacancies_stream(client):
+        return client.get("/vacancies", params={"stream": "ndjson"})
+
+    def vacancy_candidates(client):
+        return client.get(f"/vacancies/{rng.choice(ids['vacancies'])}/candidates")
+
+    etags = {}
+
+    async def vacancy_candidates_poll(client):
+        # A dashboard polling with If-None-Match: mostly 304s once the ETags are known
+        vacancy_id = rng.choice(ids["vacancies"][:20])
+        headers = {"If-None-Match": etags[vacancy_id]} if vacancy_id in etags else {}
+        response = await client.get(f"/vacancies/{vacancy_id}/candidates", headers=headers)
+        if "etag" in response.headers:
+            etags[vacancy_id] = response.headers["etag"]
+        return response
+
+    def vacancy_stats(client):
+        return client.get(f"/vacancies/{rng.choice(ids['vacancies'])}/stats")
+
+    def vacancy_matches(client):
+        return client.get(f"/vacancies/{rng.choice(ids['vacancies'])}/matches", params={"limit": 20})
+
+    def search_interviews(client):
+        params = rng.choice([
+            {"q": "reliability", "field": "red_flags", "max_score": 49},
+            {"q": "PostgreSQL indexing"},
+            {"q": "\"production incidents\"", "field": "strengths", "min_score": 70},
+        ])
+        return client.get("/interviews/search", params=params)
+
+    def search_by_description(client):
+        # A few distinct descriptions per run, so concurrent identical ones coalesce into one LLM call
+        description = f"{rng.choice(DESCRIPTIONS)} #{rng.randrange(20)}"
+        return client.post("/search/candidates", json={"description": description, "limit": 50})
+
+    def semantic_search(client):
+        return client.post("/search/semantic", json={
+            "role": rng.choice(["Backend engineer", "Data specialist", "Infrastructure engineer"]),
+            "skills": rng.choice(SKILL_QUERIES).split(","),
+            "top_k": 20,
+        })
+
+    def parse_description(client):
+        # A unique suffix defeats the LLM response cache so the stub latency is measured
+        description = f"{rng.choice(DESCRIPTIONS)} #{rng.random()}"
+        return client.post("/search/parse-description", json={"description": description})
+
+    def schedule_interview(client):
+        return client.post("/interviews/schedule", json={
+            "candidate_id": rng.choice(ids["candidates"]),
+            "vacancy_id": rng.choice(ids["vacancies"]),
+            "interview_name": "Benchmark interview",
+            "interview_date": datetime.now().isoformat(),
+            "interview_text": "Candidate explained their last project and answered SQL questions.",
+        })
+
+    available = {"candidates_search": search, "vacancies_list": list_vacancies,
+                 "vacancies_list_stream": list_vacancies_stream, "interview_search": search_interviews,
+                 "semantic_search": semantic_search, "search_by_description": search_by_description,
+                 "parse_description": parse_description}
+    if ids["vacancies"]:
+        available.update({
+            "vacancy_candidates": vacancy_candidates,
+            "vacancy_candidates_poll": vacancy_candidates_poll,
+            "vacancy_stats": vacancy_stats,
+            "vacancy_matches": vacancy_matches,
+        })
+        if ids["candidates"]:
+            available["interview_schedule"] = schedule_interview
+    return available
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def user():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+
+
+def make_client(args) -> httpx.AsyncClient:
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=120)
+
+    from llm_providers import StubProvider, set_provider
+    set_provider(StubProvider(latency=args.llm_latency, jitter=args.llm_jitter))
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+
+def compare(results: dict, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\n{'endpoint':<22}{'p95 base':>10}{'p95 now':>10}{'change':>9}")
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p95_ms"], current["p95_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > max_regression:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"{name:<22}{before:>10.1f}{after:>10.1f}{change:>+9.1%}{flag}")
+    return ok
+
+
+async def main_async(args) -> dict:
+    async with make_client(args) as client:
+        ids = await fetch_ids(client)
+        available = scenarios(ids)
+        selected = args.only or list(available)
+        results = {}
+        for name in selected:
+            if name not in available:
+                print(f"Skipping {name}: no data for it")
+                continue
+            # Warm up pools and caches before measuring
+            await run_scenario(client, available[name], min(20, args.requests), min(5, args.concurrency))
+            results[name] = await run_scenario(client, available[name], args.requests, args.concurrency)
+            r = results[name]
+            print(f"{name:<22} p50 {r['p50_ms']:>8.1f} ms  p95 {r['p95_ms']:>8.1f} ms  p99 {r['p99_ms']:>8.1f} ms  "
+                  f"{r['throughput_rps']:>8.1f} req/s  errors {r['errors']}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API hot paths.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--only", nargs="+", help="Endpoints to run (default: all).")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds.")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare against a baseline JSON file.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 increase (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "target": args.base_url or "in-process",
+            "llm_latency": args.llm_latency,
+        },
+        "results": results,
+    }
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench/scaling.py
+"""Throughput of serve.py as the worker count grows.
+
+    python -m bench.datagen --candidates 100000 --reset
+    python -m bench.scaling --workers 1 2 4 8 --requests 2000 --concurrency 64
+
+For each worker count, starts `python serve.py` (WEB_CONCURRENCY workers, stub
+LLM) on a free port, waits for /health/ready, then drives it with --load-processes
+`bench.run --base-url` processes at once, so the load generator is not the
+bottleneck. Prints req/s per endpoint and the speedup over the first worker count.
+Run it on a machine with at least as many cores as the largest worker count plus
+the load processes, or the numbers measure contention instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict
+import httpx
+
+DEFAULT_ENDPOINTS = ["candidates_search", "vacancies_list", "semantic_search", "vacancy_matches"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(base_url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{base_url} was not ready after {timeout}s")
+
+
+async def drive(base_url: str, args) -> Dict[str, dict]:
+    """Runs the load processes at once; sums their throughput, keeps the worst percentiles."""
+    per_process = max(1, args.requests // args.load_processes)
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = [os.path.join(tmp, f"load-{i}.json") for i in range(args.load_processes)]
+        processes = [
+            await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "bench.run", "--base-url", base_url, "--only", *args.only,
+                "--requests", str(per_process), "--concurrency", str(max(1, args.concurrency // args.load_processes)),
+                "--save-baseline", output, stdout=asyncio.subprocess.DEVNULL,
+            )
+            for output in outputs
+        ]
+        if any([await process.wait() for process in processes]):
+            raise RuntimeError("A load process failed")
+        reports = []
+        for output in outputs:
+            with open(output) as f:
+                reports.append(json.load(f)["results"])
+
+    combined = {}
+    for name in reports[0]:
+        runs = [report[name] for report in reports if name in report]
+        combined[name] = {
+            "throughput_rps": round(sum(run["throughput_rps"] for run in runs), 1),
+            "p95_ms": max(run["p95_ms"] for run in runs),
+            "errors": sum(run["errors"] for run in runs),
+        }
+    return combined
+
+
+async def measure(workers: int, args) -> Dict[str, dict]:
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), HOST="127.0.0.1",
+               LLM_PROVIDER="stub", LLM_STUB_LATENCY_SECONDS=str(args.llm_latency), UVICORN_ACCESS_LOG="false")
+    server = await asyncio.create_subprocess_exec(sys.executable, "serve.py", env=env, stdout=asyncio.subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url, args.ready_timeout)
+        return await drive(base_url, args)
+    finally:
+        server.terminate()
+        await server.wait()
+
+
+async def main_async(args) -> Dict[int, Dict[str, dict]]:
+    results = {}
+    for workers in args.workers:
+        results[workers] = await measure(workers, args)
+        print(f"workers={workers}: " + ", ".join(
+            f"{name} {r['throughput_rps']:.0f} req/s (p95 {r['p95_ms']:.0f} ms)" for name, r in results[workers].items()
+        ), file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput against the number of workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare.")
+    parser.add_argument("--only", nargs="+", default=DEFAULT_ENDPOINTS, help="bench.run endpoints to drive.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and worker count.")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent requests over all load processes.")
+    parser.add_argument("--load-processes", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds.")
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    base_workers = args.workers[0]
+    print(f"\n{'endpoint':<22}" + "".join(f"{f'{w} workers':>14}" for w in args.workers) + f"{'speedup':>10}")
+    for name in results[base_workers]:
+        row = [results[w][name]["throughput_rps"] for w in args.workers]
+        speedup = row[-1] / row[0] if row[0] else 0.0
+        print(f"{name:<22}" + "".join(f"{rps:>14.1f}" for rps in row) + f"{speedup:>9.2f}x")
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
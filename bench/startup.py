@@ -0,0 +1,78 @@
+# bench/startup.py
+"""Worker startup benchmark.
+
+    python -m schema --upgrade
+    python -m bench.startup --runs 10
+
+Each run starts a fresh interpreter, as a new uvicorn worker would, and measures
+the time to import the app, to enter its lifespan, until /health/ready answers
+200 (the pool is warm) and to serve a first real request, against the database
+in DATABASE_URL. Prints the median of each phase as JSON.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ["import_seconds", "lifespan_seconds", "ready_seconds", "first_request_seconds"]
+
+
+async def measure(first_path: str, ready_timeout: float) -> dict:
+    """One cold start, in this process."""
+    started_at = time.perf_counter()
+    import main
+    imported_at = time.perf_counter()
+
+    import httpx
+    from llm_providers import StubProvider, set_provider
+    set_provider(StubProvider(latency=0))
+    results = {"import_seconds": imported_at - started_at}
+    async with main.app.router.lifespan_context(main.app):
+        results["lifespan_seconds"] = time.perf_counter() - imported_at
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            while (await client.get("/health/ready")).status_code != 200:
+                if time.perf_counter() - started_at > ready_timeout:
+                    raise TimeoutError("/health/ready did not answer 200 in time")
+                await asyncio.sleep(0.005)
+            ready_at = time.perf_counter()
+            results["ready_seconds"] = ready_at - imported_at
+            response = await client.get(first_path)
+            response.raise_for_status()
+            results["first_request_seconds"] = time.perf_counter() - ready_at
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker startup.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-path", default="/vacancies", help="Request timed after readiness.")
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.first_path, args.ready_timeout))))
+        return
+
+    runs = []
+    for i in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "bench.startup", "--child",
+             "--first-path", args.first_path, "--ready-timeout", str(args.ready_timeout)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+        print(f"  run {i + 1}/{args.runs}: " + ", ".join(f"{p} {runs[-1][p]:.3f}" for p in PHASES), file=sys.stderr)
+    print(json.dumps({
+        "runs": args.runs,
+        "median": {phase: round(statistics.median(run[phase] for run in runs), 4) for phase in PHASES},
+        "max": {phase: round(max(run[phase] for run in runs), 4) for phase in PHASES},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# bulk_import.py
+import codecs
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+# A single record larger than this is treated as a malformed stream rather than
+# buffered indefinitely while waiting for it to become valid JSON.
+MAX_RECORD_BYTES = 10 * 1024 * 1024
+
+# Rows written (and committed) per batched INSERT.
+DEFAULT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+MAX_CHUNK_SIZE = 5000
+
+_WHITESPACE = " \t\r\n"
+
+async def iter_json_records(byte_stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """Yields (record_number, value, error) from a JSON array or an NDJSON body.
+
+    The format is detected from the first non-whitespace character. Records are
+    decoded as they arrive so memory stays bounded by the size of one record.
+    A malformed NDJSON line is reported and skipped; a malformed JSON array
+    cannot be resynchronised, so it ends the stream with an error.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    mode = None  # "array" or "ndjson"
+    record_number = 0
+    expect_value = True
+    array_closed = False
+    eof = False
+    chunks = byte_stream.__aiter__()
+
+    while not eof or buffer:
+        if not eof:
+            try:
+                buffer += utf8.decode(await chunks.__anext__())
+            except StopAsyncIteration:
+                buffer += utf8.decode(b"", final=True)
+                eof = True
+
+        if mode is None:
+            stripped = buffer.lstrip(_WHITESPACE)
+            if not stripped:
+                buffer = ""
+                continue
+            if stripped[0] == "[":
+                mode = "array"
+                buffer = stripped[1:]
+            else:
+                mode = "ndjson"
+                buffer = stripped
+
+        if mode == "ndjson":
+            lines = buffer.split("\n")
+            buffer = "" if eof else lines.pop()
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                record_number += 1
+                try:
+                    yield record_number, json.loads(line), None
+                except json.JSONDecodeError as e:
+                    yield record_number, None, f"Invalid JSON: {e}"
+            if len(buffer) > MAX_RECORD_BYTES:
+                yield record_number + 1, None, "Record exceeds the maximum record size."
+                return
+            continue
+
+        # Array mode: consume as many complete elements as the buffer holds.
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if array_closed:
+                yield record_number + 1, None, "Unexpected data after the end of the JSON array."
+                return
+            if expect_value:
+                if buffer[pos] == "]" and record_number == 0:
+                    array_closed = True
+                    pos += 1
+                    continue
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if eof or len(buffer) - pos > MAX_RECORD_BYTES:
+                        yield record_number + 1, None, f"Invalid JSON array: {e}"
+                        return
+                    break  # wait for the rest of the element
+                if end == len(buffer) and not eof:
+                    break  # a trailing scalar may still be incomplete
+                record_number += 1
+                yield record_number, value, None
+                pos = end
+                expect_value = False
+            elif buffer[pos] == ",":
+                pos += 1
+                expect_value = True
+            elif buffer[pos] == "]":
+                pos += 1
+                array_closed = True
+            else:
+                yield record_number + 1, None, f"Invalid JSON array: unexpected character {buffer[pos]!r}."
+                return
+        buffer = buffer[pos:]
+
+        if eof and not array_closed:
+            yield record_number + 1, None, "Invalid JSON array: unexpected end of input."
+            return
+        if eof:
+            break
+
+
+async def run_chunked_import(
+    records: AsyncIterator[Tuple[int, Any, Optional[str]]],
+    prepare: Callable[[List[Any]], Awaitable[List[Tuple[Any, Optional[str]]]]],
+    write_chunk: Callable[[List[Any]], Awaitable[Dict[str, int]]],
+    chunk_size: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Validates and writes records in chunks.
+
+    `prepare` turns a chunk of decoded records into one (item, error) pair per
+    record (see prepare_records); it is awaited per chunk, so it can run in the
+    CPU pool. Yields one progress dict per written chunk and a final summary.
+    `write_chunk` returns counters (e.g. {"inserted": 10, "skipped": 2}) which are
+    reported per chunk and summed in the summary.
+    """
+    pending: List[Tuple[int, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    totals: Dict[str, int] = {"received": 0, "rejected": 0}
+    chunk_number = 0
+
+    async def flush() -> Dict[str, Any]:
+        nonlocal pending, rejected, chunk_number
+        chunk_number += 1
+        progress: Dict[str, Any] = {"chunk": chunk_number, "received": len(pending) + len(rejected)}
+        chunk: List[Tuple[int, Any]] = []
+        if pending:
+            try:
+                prepared = await prepare([value for _, value in pending])
+            except Exception as e:
+                prepared = [(None, f"Validation failed: {e!r}")] * len(pending)
+            for (number, _), (item, error) in zip(pending, prepared):
+                if error is None:
+                    chunk.append((number, item))
+                else:
+                    rejected.append({"record": number, "error": error})
+            rejected.sort(key=lambda rejection: rejection["record"])
+        if chunk:
+            try:
+                counts = await write_chunk([item for _, item in chunk])
+            except Exception as e:
+                error = f"Database error on import: {e}"
+                progress["error"] = error
+                rejected.extend({"record": number, "error": error} for number, _ in chunk)
+                counts = {}
+            for key, value in counts.items():
+                progress[key] = value
+                totals[key] = totals.get(key, 0) + value
+        progress["rejected"] = rejected
+        totals["received"] += progress["received"]
+        totals["rejected"] += len(rejected)
+        pending, rejected = [], []
+        return progress
+
+    async for record_number, value, error in records:
+        if error is None:
+            pending.append((record_number, value))
+        else:
+            rejected.append({"record": record_number, "error": error})
+        if len(pending) + len(rejected) >= chunk_size:
+            yield await flush()
+
+    if pending or rejected:
+        yield await flush()
+
+    yield {"status": "done", "chunks": chunk_number, **totals}
+
+
+def prepare_records(values: List[Any], model: Type[BaseModel], to_row: Callable[[Any], Any]) -> List[Tuple[Any, Optional[str]]]:
+    """Validates each record against `model` and converts it with `to_row`; returns (row, error) pairs.
+
+    Each record is unwrapped from its {"fullContent": ...} envelope first. A record
+    that fails either step gets its error instead of a row.
+    """
+    results: List[Tuple[Any, Optional[str]]] = []
+    for value in values:
+        try:
+            results.append((to_row(model.model_validate(unwrap_full_content(value))), None))
+        except ValidationError as e:
+            results.append((None, str(e)))
+        except (TypeError, ValueError) as e:
+            results.append((None, f"Invalid record: {e}"))
+    return results
+
+
+def unwrap_full_content(value: Any) -> Any:
+    """Accepts either the bare import content or the {"fullContent": ...} envelope."""
+    if isinstance(value, dict) and "fullContent" in value:
+        return value["fullContent"]
+    return value
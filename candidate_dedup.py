@@ -0,0 +1,395 @@
+# candidate_dedup.py
+"""Duplicate detection for imported candidates.
+
+Every candidate row carries three fingerprints, computed on import (see
+crud.bulk_create_candidates) or by the backfill:
+
+- url_key: the normalized resume URL; the same resume imported again.
+- fingerprint: SHA-256 of the normalized title, skills and experience, for
+  resumes with experience; the same resume content under another URL or none.
+- minhash / lsh_bands: a MinHash signature of the resume's skill and experience
+  shingles, and LSH band hashes of it; an edited version of a resume. Candidates
+  sharing a band with a new resume are found with one GIN index probe and
+  compared by signature; an estimated Jaccard similarity of at least
+  DEDUP_SIMILARITY makes them duplicates.
+
+Two candidates with different resume URLs are never duplicates, however similar
+their content.
+
+Candidates imported before deduplication get their fingerprints, and existing
+duplicates are collapsed into the oldest candidate of each cluster, with:
+
+    python -m candidate_dedup --backfill [--collapse] [--dry-run]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+import uuid
+import numpy as np
+from sqlalchemy import BigInteger, bindparam, func, literal, or_, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+from database import async_session_local
+from skill_vocabulary import fold
+
+logger = logging.getLogger(__name__)
+
+# What an import does with a candidate that duplicates a stored one: "merge" updates the
+# stored candidate with the new resume, "skip" drops the new one, "insert" stores it anyway
+DEDUP_POLICIES = ("merge", "skip", "insert")
+DEDUP_POLICY = os.getenv("DEDUP_POLICY", "merge")
+# Estimated Jaccard similarity of two resumes' shingles from which they count as duplicates
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.8"))
+
+# 16 bands of 4 rows: resumes with similarity 0.5 share a band with probability ~0.64,
+# at 0.8 with probability > 0.999. Changing these requires re-running the backfill.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+
+# Hash family (a * x + b) mod p over 32-bit shingle hashes; a * x fits in uint64
+_PRIME = (1 << 32) - 5
+
+def _hash32(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+_A = np.array([_hash32(f"a{i}") % (_PRIME - 1) + 1 for i in range(MINHASH_PERMUTATIONS)], dtype=np.uint64)
+_B = np.array([_hash32(f"b{i}") % _PRIME for i in range(MINHASH_PERMUTATIONS)], dtype=np.uint64)
+
+# Arbitrary key of the advisory lock serializing duplicate resolution between importers
+_LOCK_KEY = 0x64656475
+
+# Largest LSH bucket compared pairwise by the collapse job
+MAX_BUCKET_SIZE = 500
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """Host without "www." plus path, e.g. "hh.ru/resume/abc".
+
+    The scheme, query string and fragment are dropped: on job boards they carry
+    search and tracking parameters, not the resume's identity.
+    """
+    if not url or not url.strip():
+        return None
+    url = url.strip()
+    parts = urlsplit(url if "//" in url else "//" + url)
+    host = (parts.hostname or "").removeprefix("www.")
+    if not host:
+        return None
+    return host + parts.path.rstrip("/")
+
+def shingles(skills: Optional[list], experience: Optional[list]) -> set:
+    """Skills, plus company / position / start and description word 3-grams of each past job.
+
+    Empty for resumes without experience: skills alone are too common to tell people apart.
+    """
+    result = set()
+    for job in experience or []:
+        if not isinstance(job, dict):
+            continue
+        result.add("job:" + "|".join(fold(str(job.get(key) or "")) for key in ("company", "position", "start")))
+        words = _WORD.findall(str(job.get("description") or "").casefold())
+        result.update("text:" + " ".join(words[i:i + 3]) for i in range(len(words) - 2))
+    if result:
+        result.update(f"skill:{fold(skill)}" for skill in skills or [] if isinstance(skill, str))
+    return result
+
+def signature(shingle_set: set) -> Optional[np.ndarray]:
+    if not shingle_set:
+        return None
+    hashes = np.array([_hash32(shingle) for shingle in shingle_set], dtype=np.uint64)
+    permuted = (np.outer(_A, hashes) % _PRIME + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype("<u4")
+
+def band_hashes(minhash: np.ndarray) -> List[int]:
+    """One signed 64-bit hash per band (bigint); the band number is hashed in, so bands never collide."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + minhash[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND].tobytes(), digest_size=8).digest(),
+            "little", signed=True,
+        )
+        for band in range(LSH_BANDS)
+    ]
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two stored signatures."""
+    return float(np.mean(np.frombuffer(a, dtype="<u4") == np.frombuffer(b, dtype="<u4")))
+
+def _near_duplicates(a: Optional[bytes], b: Optional[bytes]) -> bool:
+    return a is not None and b is not None and similarity(a, b) >= DEDUP_SIMILARITY
+
+def fingerprints(values: dict) -> dict:
+    """The dedup columns of a candidate row with name, skills, experience and main_url."""
+    skills = sorted(fold(skill) for skill in values.get("skills") or [] if isinstance(skill, str))
+    content = json.dumps([fold(values.get("name") or ""), skills, values.get("experience") or []], sort_keys=True, default=str)
+    minhash = signature(shingles(values.get("skills"), values.get("experience")))
+    return {
+        "url_key": normalize_url(values.get("main_url")),
+        # Like the signature, only for resumes with experience: a title and skills alone are shared by many people
+        "fingerprint": hashlib.sha256(content.encode("utf-8")).hexdigest() if minhash is not None else None,
+        "minhash": minhash.tobytes() if minhash is not None else None,
+        "lsh_bands": band_hashes(minhash) if minhash is not None else None,
+    }
+
+
+def _same_person_possible(url_a: Optional[str], url_b: Optional[str]) -> bool:
+    """Two different resume URLs are two different resumes, however similar the content."""
+    return url_a is None or url_b is None or url_a == url_b
+
+
+class _DisjointSet:
+    """Union-find that never joins two groups holding different resume URLs."""
+
+    def __init__(self):
+        self.parent = {}
+        self.url_keys = {}  # root -> the URL key of its group's members, if any
+
+    def add(self, item, url_key: Optional[str] = None):
+        root = self.find(item)
+        if url_key is not None:
+            self.url_keys.setdefault(root, url_key)
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b) -> bool:
+        """Joins the groups of a and b unless their URLs differ; returns whether they are one group."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return True
+        url_a, url_b = self.url_keys.get(root_a), self.url_keys.get(root_b)
+        if not _same_person_possible(url_a, url_b):
+            return False
+        self.parent[root_a] = root_b
+        if url_b is None and url_a is not None:
+            self.url_keys[root_b] = url_a
+        return True
+
+    def union_all(self, items: Iterable):
+        items = list(items)
+        for item in items[1:]:
+            self.union(items[0], item)
+
+    def groups(self) -> List[list]:
+        members = defaultdict(list)
+        for item in list(self.parent):
+            members[self.find(item)].append(item)
+        return list(members.values())
+
+
+def collapse_rows(rows: List[dict]) -> List[dict]:
+    """Drops rows of a chunk that a later row of the same chunk duplicates (the later resume
+    wins, keeping the URL of the latest row that has one).
+
+    Rows with different resume URLs are never duplicates of each other, even through a third row.
+    """
+    groups = _DisjointSet()
+    exact: Dict[tuple, int] = {}
+    by_band = defaultdict(list)
+    for index, row in enumerate(rows):
+        groups.add(index, row["url_key"])
+        for key in (("url", row["url_key"]), ("fingerprint", row["fingerprint"])):
+            if key[1] is not None:
+                groups.union(exact.setdefault(key, index), index)
+        for band in row["lsh_bands"] or []:
+            for other in by_band[band]:
+                if groups.find(other) != groups.find(index) and _near_duplicates(rows[other]["minhash"], row["minhash"]):
+                    groups.union(other, index)
+            by_band[band].append(index)
+    kept = []
+    for members in groups.groups():
+        row = rows[max(members)]
+        linked = next((rows[index] for index in sorted(members, reverse=True) if rows[index]["url_key"]), row)
+        # The later resume wins, but not at the cost of the group's URL
+        kept.append((max(members), {**row, "main_url": linked["main_url"], "url_key": linked["url_key"]}))
+    return [row for _, row in sorted(kept, key=lambda item: item[0])]
+
+async def lock(db: AsyncSession):
+    """Serializes duplicate resolution with other importers until the transaction ends."""
+    await db.execute(select(func.pg_advisory_xact_lock(_LOCK_KEY)))
+
+async def match_existing(db: AsyncSession, rows: List[dict]) -> List[Optional[uuid.UUID]]:
+    """For each row, the stored candidate it duplicates (the oldest, if several), or None.
+
+    One query finds every stored candidate sharing a URL, a fingerprint or an LSH
+    band with any row; band matches are then verified by signature similarity.
+    Content and band matches with a different resume URL than the row's are not
+    duplicates.
+    """
+    candidate = models.Candidate
+    url_keys = {row["url_key"] for row in rows if row["url_key"]}
+    content_keys = {row["fingerprint"] for row in rows if row["fingerprint"]}
+    bands = {band for row in rows for band in row["lsh_bands"] or []}
+    conditions = []
+    if url_keys:
+        conditions.append(candidate.url_key.in_(url_keys))
+    if content_keys:
+        conditions.append(candidate.fingerprint.in_(content_keys))
+    if bands:
+        conditions.append(candidate.lsh_bands.overlap(literal(sorted(bands), ARRAY(BigInteger))))
+    if not conditions:
+        return [None] * len(rows)
+
+    result = await db.execute(
+        select(candidate.id, candidate.url_key, candidate.fingerprint, candidate.minhash, candidate.lsh_bands)
+        .where(or_(*conditions))
+        .order_by(candidate.created_at, candidate.id)
+    )
+    by_url, by_content, by_band = {}, defaultdict(list), defaultdict(list)
+    for stored in result:
+        if stored.url_key:
+            by_url.setdefault(stored.url_key, stored.id)
+        if stored.fingerprint:
+            by_content[stored.fingerprint].append(stored)
+        for band in stored.lsh_bands or []:
+            by_band[band].append(stored)
+
+    matches = []
+    for row in rows:
+        match = by_url.get(row["url_key"])
+        if match is None:
+            match = next((
+                stored.id for stored in by_content.get(row["fingerprint"], ())
+                if _same_person_possible(row["url_key"], stored.url_key)
+            ), None)
+        if match is None and row["minhash"] is not None:
+            best = 0.0
+            for band in row["lsh_bands"]:
+                for stored in by_band.get(band, ()):
+                    if stored.minhash is None or not _same_person_possible(row["url_key"], stored.url_key):
+                        continue
+                    score = similarity(row["minhash"], stored.minhash)
+                    if score >= DEDUP_SIMILARITY and score > best:
+                        best, match = score, stored.id
+        matches.append(match)
+    return matches
+
+
+async def backfill(batch_size: int = 1000) -> int:
+    """Computes the fingerprints of candidates that have none; returns how many were updated."""
+    candidate = models.Candidate
+    table = candidate.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("candidate_id"))
+        .values(
+            url_key=bindparam("new_url_key"), fingerprint=bindparam("new_fingerprint"),
+            minhash=bindparam("new_minhash"), lsh_bands=bindparam("new_lsh_bands"),
+            # Keep updated_at: the resume itself is unchanged
+            updated_at=table.c.updated_at,
+        )
+    )
+    total = 0
+    last_id = None
+    async with async_session_local() as db:
+        while True:
+            query = (
+                select(candidate.id, candidate.name, candidate.skills, candidate.experience, candidate.main_url)
+                # Resumes without experience or URL have nothing to fingerprint and are simply redone
+                .where(candidate.url_key.is_(None), candidate.fingerprint.is_(None), candidate.lsh_bands.is_(None))
+                .order_by(candidate.id)
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                query = query.where(candidate.id > last_id)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+            params = [
+                {"candidate_id": row.id, **{f"new_{key}": value for key, value in fingerprints(row._asdict()).items()}}
+                for row in rows
+            ]
+            await db.execute(stmt, params)
+            await db.commit()
+            total += len(rows)
+            last_id = rows[-1].id
+            logger.info("Fingerprinted %d candidates", total)
+    return total
+
+async def find_clusters(db: AsyncSession) -> List[List[uuid.UUID]]:
+    """Groups of stored candidates that are duplicates of each other, by URL, content or LSH."""
+    candidate = models.Candidate
+    groups = _DisjointSet()
+    exact_groups = []
+    for column in (candidate.url_key, candidate.fingerprint):
+        result = await db.execute(
+            select(func.array_agg(candidate.id)).where(column.is_not(None)).group_by(column).having(func.count() > 1)
+        )
+        exact_groups += [ids for (ids,) in result]
+
+    # Postgres groups by band, so only colliding buckets come back
+    result = await db.execute(text(
+        "SELECT array_agg(id) FROM (SELECT id, unnest(lsh_bands) AS band FROM candidates) AS bands "
+        "GROUP BY band HAVING count(*) > 1"
+    ))
+    buckets = [ids for (ids,) in result]
+    signatures = {}
+    needed = list({candidate_id for ids in exact_groups + buckets for candidate_id in ids})
+    for start in range(0, len(needed), 5000):
+        result = await db.execute(
+            select(candidate.id, candidate.url_key, candidate.minhash).where(candidate.id.in_(needed[start:start + 5000]))
+        )
+        for row in result:
+            groups.add(row.id, row.url_key)
+            signatures[row.id] = row.minhash
+    for ids in exact_groups:
+        groups.union_all(ids)
+    for ids in buckets:
+        if len(ids) > MAX_BUCKET_SIZE:
+            logger.warning("Comparing only %d of %d candidates sharing an LSH band", MAX_BUCKET_SIZE, len(ids))
+            ids = ids[:MAX_BUCKET_SIZE]
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                if groups.find(a) != groups.find(b) and _near_duplicates(signatures.get(a), signatures.get(b)):
+                    groups.union(a, b)
+    return [members for members in groups.groups() if len(members) > 1]
+
+async def collapse(dry_run: bool = False, batch_size: int = 200) -> dict:
+    """Merges every cluster of duplicates into one candidate (see crud.merge_candidates)."""
+    import crud  # crud imports this module
+
+    async with async_session_local() as db:
+        clusters = await find_clusters(db)
+    stats = {"clusters": len(clusters), "removed": sum(len(cluster) - 1 for cluster in clusters)}
+    if dry_run:
+        return stats
+    for start in range(0, len(clusters), batch_size):
+        async with async_session_local() as db:
+            await lock(db)
+            await crud.merge_candidates(db, clusters[start:start + batch_size])
+        logger.info("Merged %d/%d duplicate clusters", min(start + batch_size, len(clusters)), len(clusters))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Candidate duplicate detection maintenance.")
+    parser.add_argument("--backfill", action="store_true", help="Fingerprint candidates that have no fingerprints.")
+    parser.add_argument("--collapse", action="store_true", help="Merge existing duplicates into one candidate each.")
+    parser.add_argument("--dry-run", action="store_true", help="With --collapse: only count the duplicates.")
+    args = parser.parse_args()
+    if not (args.backfill or args.collapse):
+        parser.print_help()
+    else:
+        async def main():
+            if args.backfill:
+                print(f"Fingerprinted {await backfill()} candidates.")
+            if args.collapse:
+                stats = await collapse(args.dry_run)
+                verb = "Would remove" if args.dry_run else "Removed"
+                print(f"{verb} {stats['removed']} duplicates in {stats['clusters']} clusters.")
+        asyncio.run(main())
@@ -0,0 +1,76 @@
+# cpu_pool.py
+"""A process pool for CPU-heavy request work, such as validating bulk imports.
+
+Work run on the event loop blocks every other request of the worker, and threads
+do not help with pure-Python work. `await cpu_pool.run(fn, *args)` runs `fn` in
+a child process instead; `fn` and its arguments and result must be picklable, so
+`fn` has to be a module-level function.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Child processes per API worker; 0 runs the work inline on the event loop.
+# The default splits the cores between the WEB_CONCURRENCY workers of serve.py.
+CPU_POOL_WORKERS = int(os.getenv(
+    "CPU_POOL_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1"))))),
+))
+
+
+class CPUPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.tasks = 0
+        self.in_flight = 0
+        self.seconds_total = 0.0
+        self.restarts = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # Spawned, not forked: a fork would copy the event loop, its sockets and held locks
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        started_at = time.perf_counter()
+        self.tasks += 1
+        self.in_flight += 1
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        except BrokenProcessPool:
+            # A child died (e.g. killed for memory); the next call starts a new pool
+            logger.error("CPU pool broken; restarting it on the next call")
+            self.executor = None
+            self.restarts += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.seconds_total += time.perf_counter() - started_at
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "started": self.executor is not None,
+            "tasks": self.tasks,
+            "in_flight": self.in_flight,
+            "seconds_total": round(self.seconds_total, 6),
+            "restarts": self.restarts,
+        }
+
+
+cpu_pool = CPUPool(CPU_POOL_WORKERS)
@@ -1,11 +1,26 @@
 # crud.py
+import hashlib
+import json
 import uuid
-from typing import List, Optional
-from sqlalchemy import select, or_
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from sqlalchemy import Integer, Text, delete, select, update, and_, or_, bindparam, case, func, literal, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 import models, schemas
+from skill_vocabulary import vocabulary
+import vacancy_stats
+import candidate_dedup
+import embeddings
+import bulk_import
 import re
 
+# Interview.analysis_status values
+ANALYSIS_PENDING = "pending"
+ANALYSIS_RUNNING = "running"
+ANALYSIS_DONE = "done"
+ANALYSIS_FAILED = "failed"
+
 def parse_experience_years(exp_str: Optional[str]) -> Optional[tuple[int, int]]:
     """Converts '3-5 years' or '5+ years' or '2 years' into a tuple of min/max months."""
     if not exp_str:
@@ -36,23 +51,26 @@ def parse_experience_years(exp_str: Optional[str]) -> Optional[tuple[int, int]]:
     except ValueError:
         return None
 
-async def search_candidates(
-    db: AsyncSession,
+def _filter_candidates(
+    query,
     role: Optional[str],
     skills: Optional[List[str]],
     experience_years: Optional[str],
-) -> List[models.Candidate]:
-    query = select(models.Candidate)
-    
+    cursor: Optional[uuid.UUID] = None,
+):
     if role:
-        # Simple search in the name/title
+        # Simple search in the name/title (served by the trigram index)
         query = query.where(models.Candidate.name.ilike(f"%{role}%"))
         
     if skills:
-        # OR logic for skills: candidate must have at least one of the skills
-        # JSONB containment: skills @> '["Python"]'
-        skill_conditions = [models.Candidate.skills.contains([skill]) for skill in skills]
-        query = query.where(or_(*skill_conditions))
+        # OR logic for skills: candidate must have at least one of the skills.
+        # Known skills match on vocabulary IDs (skill_ids && array[1, 7]); the names
+        # also go to skills ?| array[...] for unknown skills. Both are GIN index probes.
+        names, ids = vocabulary.canonicalize(skills)
+        conditions = [models.Candidate.skills.has_any(literal(names, ARRAY(Text)))]
+        if ids:
+            conditions.append(models.Candidate.skill_ids.overlap(literal(ids, ARRAY(Integer))))
+        query = query.where(or_(*conditions))
 
     exp_range_months = parse_experience_years(experience_years)
     if exp_range_months:
@@ -62,56 +80,402 @@ async def search_candidates(
         else:
             query = query.where(models.Candidate.total_experience_months.between(min_months, max_months))
 
+    if cursor:
+        query = query.where(models.Candidate.id > cursor)
+    return query.order_by(models.Candidate.id)
+
+# Columns returned by candidate search (schemas.CandidateSearchResponse)
+CANDIDATE_SEARCH_COLUMNS = (
+    models.Candidate.id, models.Candidate.name, models.Candidate.skills,
+    models.Candidate.total_experience_months, models.Candidate.status, models.Candidate.main_url,
+)
+
+async def search_candidates(
+    db: AsyncSession,
+    role: Optional[str],
+    skills: Optional[List[str]],
+    experience_years: Optional[str],
+    limit: int = 50,
+    cursor: Optional[uuid.UUID] = None,
+) -> List[dict]:
+    """Returns one page of matching candidates ordered by id, as dicts of CANDIDATE_SEARCH_COLUMNS.
+
+    Pagination is keyset-based: pass the id of the last candidate of the previous
+    page as `cursor` to get the next page.
+    """
+    query = _filter_candidates(select(*CANDIDATE_SEARCH_COLUMNS), role, skills, experience_years, cursor).limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return [row._asdict() for row in result]
 
-async def create_candidate(db: AsyncSession, candidate_data: schemas.CandidateImportContent) -> models.Candidate:
+async def stream_candidates(
+    db: AsyncSession,
+    role: Optional[str],
+    skills: Optional[List[str]],
+    experience_years: Optional[str],
+    limit: Optional[int] = None,
+    cursor: Optional[uuid.UUID] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[List[dict]]:
+    """Yields matching candidates in batches of plain dicts from a server-side cursor."""
+    query = _filter_candidates(select(*CANDIDATE_SEARCH_COLUMNS), role, skills, experience_years, cursor)
+    if limit:
+        query = query.limit(limit)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield [row._asdict() for row in rows]
+
+async def get_candidates_by_ids(
+    db: AsyncSession, candidate_ids: List[uuid.UUID], experience_years: Optional[str] = None,
+) -> dict:
+    """Search result columns of the given candidates, keyed by id; optionally only those within an experience range."""
+    query = _filter_candidates(select(*CANDIDATE_SEARCH_COLUMNS), None, None, experience_years)
+    query = query.where(models.Candidate.id.in_(candidate_ids))
+    result = await db.execute(query)
+    return {row.id: row._asdict() for row in result}
+
+def _candidate_values(candidate_data: schemas.CandidateImportContent) -> dict:
     total_months = candidate_data.total_experience.get("months") if candidate_data.total_experience else 0
-    
-    db_candidate = models.Candidate(
+    skills, skill_ids = vocabulary.canonicalize(candidate_data.skills_atomic)
+    return dict(
         name=candidate_data.title,
-        email=f"{uuid.uuid4().hex[:12]}@dummy.com", # Create dummy email
-        phone="+1234567890",
-        skills=candidate_data.skills_atomic,
+        # Imports carry no contact details; identity comes from candidate_dedup's fingerprints
+        email=None,
+        phone=None,
+        skills=skills,
+        skill_ids=skill_ids,
         experience=candidate_data.experience,
         education=candidate_data.education,
         main_url=candidate_data.alternate_url,
         total_experience_months=total_months,
         status="New"
     )
-    db.add(db_candidate)
-    await db.commit()
-    await db.refresh(db_candidate)
-    return db_candidate
 
-async def get_all_vacancies(db: AsyncSession) -> List[models.Vacancy]:
-    result = await db.execute(select(models.Vacancy).order_by(models.Vacancy.created_at.desc()))
-    return result.scalars().all()
+def _candidate_row(candidate_data: schemas.CandidateImportContent) -> dict:
+    """The candidate's column values with its duplicate fingerprints."""
+    row = _candidate_values(candidate_data)
+    row.update(candidate_dedup.fingerprints(row))
+    return row
 
-async def create_vacancy(db: AsyncSession, vacancy_data: schemas.VacancyImportContent) -> models.Vacancy:
+def _candidate_texts(rows: List[dict]) -> List[str]:
+    return [embeddings.candidate_text(row["name"], row.get("summary"), row["skills"], row["experience"]) for row in rows]
+
+def _set_embeddings(rows: List[dict], vectors, model: str):
+    for row, vector in zip(rows, vectors):
+        row["embedding"] = embeddings.to_bytes(vector)
+        row["embedding_model"] = model
+
+async def _embed_candidates(rows: List[dict]):
+    """Adds the semantic search embedding to the candidate value dicts that have none yet."""
+    rows = [row for row in rows if "embedding" not in row]
+    if rows:
+        vectors = await embeddings.embed_texts(_candidate_texts(rows))
+        _set_embeddings(rows, vectors, embeddings.get_embedder().name)
+
+def prepare_candidate_rows(values: List[Any]) -> List[Tuple[Optional[dict], Optional[str]]]:
+    """Validates raw import records into fingerprinted candidate rows (see bulk_import.prepare_records).
+
+    Runs in the CPU pool. The hashing embedder runs there too; a model-based one
+    stays in the API process, which already has the model loaded.
+    """
+    results = bulk_import.prepare_records(values, schemas.CandidateImportContent, _candidate_row)
+    if embeddings.EMBEDDING_BACKEND == "hashing":
+        rows = [row for row, _ in results if row is not None]
+        embedder = embeddings.get_embedder()
+        _set_embeddings(rows, embedder.embed(_candidate_texts(rows)), embedder.name)
+    return results
+
+# Columns a merge copies from the newer resume into the stored candidate
+_CANDIDATE_MERGE_COLUMNS = (
+    "name", "skills", "skill_ids", "experience", "education", "main_url", "total_experience_months",
+    "embedding", "embedding_model", "url_key", "fingerprint", "minhash", "lsh_bands",
+)
+
+async def _write_candidates(db: AsyncSession, rows: List[dict], policy: str) -> Tuple[dict, List[uuid.UUID]]:
+    """Inserts fingerprinted candidate rows, resolving duplicates by `policy` (see candidate_dedup), and commits.
+
+    Returns the counters and the ids of the inserted and of the duplicated stored candidates.
+    """
+    received = len(rows)
+    if policy != "insert":
+        rows = candidate_dedup.collapse_rows(rows)
+    await _embed_candidates(rows)
+    candidates = models.Candidate.__table__
+    try:
+        matches = [None] * len(rows)
+        if policy != "insert":
+            await candidate_dedup.lock(db)
+            matches = await candidate_dedup.match_existing(db, rows)
+
+        new_rows = [row for row, match in zip(rows, matches) if match is None]
+        ids = []
+        if new_rows:
+            result = await db.execute(
+                pg_insert(candidates).returning(candidates.c.id), new_rows,
+            )
+            ids = [row.id for row in result]
+
+        merged = [(match, row) for row, match in zip(rows, matches) if match is not None] if policy == "merge" else []
+        if merged:
+            new_values = {column: bindparam(f"new_{column}") for column in _CANDIDATE_MERGE_COLUMNS}
+            # A resume without a URL keeps the stored one
+            for column in ("main_url", "url_key"):
+                new_values[column] = func.coalesce(new_values[column], candidates.c[column])
+            stmt = update(candidates).where(candidates.c.id == bindparam("candidate_id")).values(**new_values)
+            await db.execute(stmt, [
+                {"candidate_id": match, **{f"new_{column}": row[column] for column in _CANDIDATE_MERGE_COLUMNS}}
+                for match, row in sorted(merged, key=lambda item: str(item[0]))
+            ])
+            # The merged candidates' pipelines show the new resume
+            await db.execute(_bump_pipeline_versions([match for match, _ in merged]))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    counts = {"inserted": len(ids), "merged": len(merged), "skipped": received - len(ids) - len(merged)}
+    return counts, ids + [match for match in matches if match is not None]
+
+async def create_candidate(
+    db: AsyncSession, candidate_data: schemas.CandidateImportContent, policy: str = candidate_dedup.DEDUP_POLICY,
+) -> Tuple[dict, Optional[uuid.UUID]]:
+    """Imports one candidate; returns the counters and the id of the new or duplicated candidate."""
+    counts, ids = await _write_candidates(db, [_candidate_row(candidate_data)], policy)
+    return counts, ids[0] if ids else None
+
+async def bulk_create_candidates(db: AsyncSession, rows: List[dict], policy: str = candidate_dedup.DEDUP_POLICY) -> dict:
+    """Inserts a chunk of rows from prepare_candidate_rows in one batched statement and commits once.
+
+    Duplicates, within the chunk or of stored candidates, are merged into the
+    stored candidate or skipped according to `policy`.
+    """
+    counts, _ = await _write_candidates(db, rows, policy)
+    return counts
+
+async def merge_candidates(db: AsyncSession, clusters: List[List[uuid.UUID]]):
+    """Collapses each cluster of duplicate candidates into its oldest member, and commits.
+
+    The survivor takes the resume of the most recently updated member (and the URL of
+    the newest member that has one), the status and vacancy of the most recently
+    updated member past "New" (its own if none), inherits every interview, and the
+    others are deleted.
+    """
+    candidate = models.Candidate
+    members = [candidate_id for cluster in clusters for candidate_id in cluster]
+    result = await db.execute(
+        select(
+            candidate.id, candidate.status, candidate.vacancy_id, candidate.main_url, candidate.url_key,
+            candidate.created_at, candidate.updated_at,
+        )
+        .where(candidate.id.in_(members))
+    )
+    found = {row.id: row for row in result}
+    plans = []
+    for cluster in clusters:
+        rows = [found[candidate_id] for candidate_id in cluster if candidate_id in found]
+        if len(rows) < 2:
+            continue
+        survivor = min(rows, key=lambda row: (row.created_at or datetime.max, str(row.id)))
+        by_recency = sorted(rows, key=lambda row: (row.updated_at or datetime.min, str(row.id)), reverse=True)
+        latest = by_recency[0]
+        # A cluster holds at most one resume URL (see candidate_dedup); keep it even if the latest has none
+        linked = next((row for row in by_recency if row.url_key), latest)
+        progressed = [row for row in rows if row.status and row.status != "New"]
+        # Status and vacancy go together: the vacancy is the one the status refers to
+        stage = max(progressed, key=lambda row: (row.updated_at or datetime.min, str(row.id))) if progressed else survivor
+        plans.append((survivor.id, latest.id, linked, stage, [row.id for row in rows if row.id != survivor.id]))
+    if not plans:
+        return
+
+    candidates = candidate.__table__
+    interviews = models.Interview.__table__
+    latest = candidates.alias("latest")
+    try:
+        await db.execute(
+            update(candidates)
+            .where(candidates.c.id == bindparam("survivor_id"), latest.c.id == bindparam("latest_id"))
+            .values(
+                status=bindparam("new_status"), vacancy_id=bindparam("new_vacancy_id"),
+                main_url=bindparam("new_main_url"), url_key=bindparam("new_url_key"),
+                **{column: latest.c[column] for column in _CANDIDATE_MERGE_COLUMNS if column not in ("main_url", "url_key")},
+            ),
+            [
+                {
+                    "survivor_id": survivor_id, "latest_id": latest_id,
+                    "new_status": stage.status, "new_vacancy_id": stage.vacancy_id,
+                    "new_main_url": linked.main_url, "new_url_key": linked.url_key,
+                }
+                for survivor_id, latest_id, linked, stage, _ in plans
+            ],
+        )
+        await db.execute(
+            update(interviews).where(interviews.c.candidate_id == bindparam("duplicate_id")).values(candidate_id=bindparam("survivor_id")),
+            [{"duplicate_id": duplicate_id, "survivor_id": survivor_id} for survivor_id, *_, duplicates in plans for duplicate_id in duplicates],
+        )
+        await db.execute(delete(candidates).where(candidates.c.id.in_(
+            [duplicate_id for *_, duplicates in plans for duplicate_id in duplicates]
+        )))
+        await db.execute(_bump_pipeline_versions([survivor_id for survivor_id, *_ in plans]))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+# Columns returned by the vacancy list (schemas.VacancyListResponse)
+VACANCY_LIST_COLUMNS = (models.Vacancy.id, models.Vacancy.title, models.Vacancy.status, models.Vacancy.published_date)
+
+async def get_all_vacancies(db: AsyncSession) -> List[dict]:
+    """All vacancies, newest first, as dicts of VACANCY_LIST_COLUMNS."""
+    result = await db.execute(select(*VACANCY_LIST_COLUMNS).order_by(models.Vacancy.created_at.desc()))
+    return [row._asdict() for row in result]
+
+async def stream_vacancies(db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[List[dict]]:
+    """Yields all vacancies, newest first, in batches of plain dicts from a server-side cursor."""
+    query = select(*VACANCY_LIST_COLUMNS).order_by(models.Vacancy.created_at.desc())
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield [row._asdict() for row in rows]
+
+# Columns that come from the job board; a change in any of them changes content_hash
+_VACANCY_CONTENT_COLUMNS = ("title", "published_date", "responsibilities", "requirements_experience", "requirements_skills")
+
+def _vacancy_values(vacancy_data: schemas.VacancyImportContent) -> dict:
     published_date = vacancy_data.published_at.date() if vacancy_data.published_at else None
-    db_vacancy = models.Vacancy(
+    skills, skill_ids = vocabulary.canonicalize(vacancy_data.skills_atomic)
+    values = dict(
         title=vacancy_data.title,
         published_date=published_date,
         responsibilities=vacancy_data.responsibilities,
         requirements_experience=vacancy_data.requirements_experience,
-        requirements_skills=vacancy_data.skills_atomic,
-        status="Open"
+        requirements_skills=skills,
+    )
+    # Hashed after canonicalization, so a vocabulary change also refreshes the row on re-import
+    content = json.dumps(values, sort_keys=True, default=str)
+    values["requirement_skill_ids"] = skill_ids
+    external_id = vacancy_data.id if vacancy_data.id is not None else vacancy_data.alternate_url
+    values["external_id"] = str(external_id) if external_id is not None else None
+    values["content_hash"] = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    values["status"] = "Open"
+    return values
+
+def _vacancy_upsert(table=models.Vacancy):
+    """INSERT ... ON CONFLICT (external_id) DO UPDATE, skipping rows whose content_hash is unchanged."""
+    stmt = pg_insert(table)
+    update_columns = {
+        column: stmt.excluded[column]
+        for column in _VACANCY_CONTENT_COLUMNS + ("requirement_skill_ids", "content_hash")
+    }
+    update_columns["updated_at"] = func.now()
+    return stmt.on_conflict_do_update(
+        index_elements=[models.Vacancy.external_id],
+        set_=update_columns,
+        where=models.Vacancy.content_hash.is_distinct_from(stmt.excluded.content_hash),
     )
-    db.add(db_vacancy)
+
+async def create_vacancy(db: AsyncSession, vacancy_data: schemas.VacancyImportContent) -> models.Vacancy:
+    values = _vacancy_values(vacancy_data)
+    if values["external_id"] is None:
+        db_vacancy = models.Vacancy(**values)
+        db.add(db_vacancy)
+        await db.commit()
+        await db.refresh(db_vacancy)
+        return db_vacancy
+
+    result = await db.execute(_vacancy_upsert().values(**values).returning(models.Vacancy))
+    db_vacancy = result.scalars().one_or_none()
+    if db_vacancy is None:
+        # Content unchanged: the upsert skipped the row, so return the stored one
+        result = await db.execute(select(models.Vacancy).where(models.Vacancy.external_id == values["external_id"]))
+        db_vacancy = result.scalars().one()
     await db.commit()
-    await db.refresh(db_vacancy)
     return db_vacancy
 
-async def get_candidates_for_vacancy(db: AsyncSession, vacancy_id: uuid.UUID) -> List[tuple[models.Candidate, Optional[uuid.UUID]]]:
+def prepare_vacancy_rows(values: List[Any]) -> List[Tuple[Optional[dict], Optional[str]]]:
+    """Validates raw import records into vacancy rows (see bulk_import.prepare_records); runs in the CPU pool."""
+    return bulk_import.prepare_records(values, schemas.VacancyImportContent, _vacancy_values)
+
+async def bulk_upsert_vacancies(db: AsyncSession, rows: List[dict]) -> dict:
+    """Upserts a chunk of rows from prepare_vacancy_rows on external_id in one batched statement and commits once."""
+
+    # A statement cannot update the same row twice, so keep the last occurrence of each key
+    by_key = {}
+    for index, row in enumerate(rows):
+        by_key[row["external_id"] if row["external_id"] is not None else index] = row
+    unique_rows = list(by_key.values())
+
+    # xmax is 0 only for freshly inserted tuples; rows skipped by the WHERE clause return nothing
+    stmt = _vacancy_upsert(models.Vacancy.__table__).returning(literal_column("xmax = 0").label("inserted"))
+    try:
+        result = await db.execute(stmt, unique_rows)
+        flags = result.scalars().all()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    inserted = sum(1 for flag in flags if flag)
+    updated = len(flags) - inserted
+    return {"inserted": inserted, "updated": updated, "unchanged": len(rows) - inserted - updated}
+
+async def get_pipeline_version(db: AsyncSession, vacancy_id: uuid.UUID) -> Optional[int]:
+    """Returns the vacancy's pipeline_version, or None if the vacancy does not exist."""
+    result = await db.execute(select(models.Vacancy.pipeline_version).where(models.Vacancy.id == vacancy_id))
+    return result.scalar_one_or_none()
+
+async def get_candidates_for_vacancy(db: AsyncSession, vacancy_id: uuid.UUID) -> List[dict]:
+    """Returns the candidates interviewed for a vacancy as dicts of id, name, status and interview_id.
+
+    Only these columns are loaded, not the candidates' experience/education blobs.
+    """
     # We need to find candidates linked via an interview for this vacancy
     query = (
-        select(models.Candidate, models.Interview.id)
+        select(
+            models.Candidate.id, models.Candidate.name, models.Candidate.status,
+            models.Interview.id.label("interview_id"),
+        )
         .join(models.Interview, models.Candidate.id == models.Interview.candidate_id)
         .where(models.Interview.vacancy_id == vacancy_id)
     )
     result = await db.execute(query)
-    return result.all()
+    return [row._asdict() for row in result]
+
+def _bump_pipeline_versions(candidate_ids, extra_vacancy_id=None, guard=None):
+    """UPDATE bumping pipeline_version of every vacancy the candidates are interviewed for.
+
+    `candidate_ids` is a scalar subquery or value; `extra_vacancy_id` covers an
+    interview inserted by the same statement (invisible to its subquery) and
+    `guard` is an optional condition that must hold for anything to be bumped.
+    """
+    vacancies = models.Vacancy.__table__
+    interviewed = select(models.Interview.vacancy_id).where(models.Interview.candidate_id.in_(candidate_ids))
+    affected = vacancies.c.id.in_(interviewed)
+    if extra_vacancy_id is not None:
+        affected = or_(affected, vacancies.c.id == extra_vacancy_id)
+    stmt = (
+        update(vacancies)
+        .where(affected)
+        # Keep updated_at: it tracks the vacancy's own content, not its pipeline
+        .values(pipeline_version=vacancies.c.pipeline_version + 1, updated_at=vacancies.c.updated_at)
+    )
+    return stmt.where(guard) if guard is not None else stmt
+
+async def update_candidate_status(db: AsyncSession, candidate_id: uuid.UUID, status: str) -> bool:
+    """Sets a candidate's status and invalidates the pipelines showing them. Returns False if not found."""
+    candidates = models.Candidate.__table__
+    updated = (
+        update(candidates)
+        .where(candidates.c.id == candidate_id, candidates.c.status.is_distinct_from(status))
+        .values(status=status)
+        .returning(candidates.c.id)
+        .cte("updated_candidate")
+    )
+    bumped = _bump_pipeline_versions(select(updated.c.id)).cte("bumped_pipelines")
+    stmt = (
+        select(candidates.c.id)
+        .where(candidates.c.id == candidate_id)
+        .add_cte(updated, bumped)
+    )
+    result = await db.execute(stmt)
+    found = result.scalar_one_or_none() is not None
+    await db.commit()
+    return found
 
 async def get_interview_by_id(db: AsyncSession, interview_id: uuid.UUID) -> Optional[models.Interview]:
     result = await db.execute(select(models.Interview).where(models.Interview.id == interview_id))
@@ -125,24 +489,280 @@ async def get_vacancy_by_id(db: AsyncSession, vacancy_id: uuid.UUID) -> Optional
     result = await db.execute(select(models.Vacancy).where(models.Vacancy.id == vacancy_id))
     return result.scalars().one_or_none()
     
-async def schedule_interview(db: AsyncSession, interview_data: schemas.InterviewScheduleRequest, analysis_result: schemas.InterviewAnalysis) -> models.Interview:
-    # 1. Create the Interview record
-    db_interview = models.Interview(
-        candidate_id=interview_data.candidate_id,
-        vacancy_id=interview_data.vacancy_id,
-        interview_name=interview_data.interview_name,
-        interview_date=interview_data.interview_date,
-        interview_text=interview_data.interview_text,
-        interview_analysis=analysis_result.model_dump() # Store analysis as JSON
-    )
-    db.add(db_interview)
-    
-    # 2. Update the candidate's status
-    candidate = await get_candidate_by_id(db, interview_data.candidate_id)
-    if candidate:
-        candidate.status = "Interview Scheduled"
-        candidate.vacancy_id = interview_data.vacancy_id
+async def schedule_interview(db: AsyncSession, interview_data: schemas.InterviewScheduleRequest):
+    """Creates the interview and moves the candidate to "Interview Scheduled" in one statement.
+
+    Runs as a single round trip:
 
+        WITH updated_candidate AS (
+            UPDATE candidates SET status = ..., vacancy_id = :vacancy_id
+            WHERE id = :candidate_id AND EXISTS (SELECT FROM vacancies WHERE id = :vacancy_id)
+            RETURNING id)
+        INSERT INTO interviews (...) SELECT ... FROM updated_candidate RETURNING ...
+
+    so nothing is written unless both the candidate and the vacancy exist. Two more
+    CTEs bump pipeline_version of the vacancies whose pipeline shows the candidate
+    and count the interview in the vacancy's stats.
+    Returns the (id, candidate_id, analysis_status) row of the new interview, or
+    None if either one is missing. The analysis is filled in later by the analysis worker.
+    """
+    candidates = models.Candidate.__table__
+    interviews = models.Interview.__table__
+    vacancy_exists = select(models.Vacancy.id).where(models.Vacancy.id == interview_data.vacancy_id).exists()
+    updated_candidate = (
+        update(candidates)
+        .where(candidates.c.id == interview_data.candidate_id, vacancy_exists)
+        .values(status="Interview Scheduled", vacancy_id=interview_data.vacancy_id)
+        .returning(candidates.c.id)
+        .cte("updated_candidate")
+    )
+    values = {
+        "id": uuid.uuid4(),
+        "vacancy_id": interview_data.vacancy_id,
+        "interview_name": interview_data.interview_name,
+        "interview_date": interview_data.interview_date,
+        "interview_text": interview_data.interview_text,
+        "analysis_status": ANALYSIS_PENDING,
+        "analysis_attempts": 0,
+    }
+    columns = ["candidate_id", *values]
+    selected = select(
+        updated_candidate.c.id,
+        *(literal(value, interviews.c[name].type) for name, value in values.items()),
+    ).select_from(updated_candidate)
+    stmt = (
+        pg_insert(interviews)
+        .from_select(columns, selected, include_defaults=False)
+        .returning(interviews.c.id, interviews.c.candidate_id, interviews.c.analysis_status)
+    )
+    # The candidate's status shows on every pipeline they are in, plus the new one
+    bumped = _bump_pipeline_versions(
+        [interview_data.candidate_id],
+        extra_vacancy_id=interview_data.vacancy_id,
+        guard=select(updated_candidate.c.id).exists(),
+    ).cte("bumped_pipelines")
+    scheduled = vacancy_stats.scheduled_increment(interview_data.vacancy_id, updated_candidate).cte("counted_interview")
+    stmt = stmt.add_cte(bumped, scheduled)
+    result = await db.execute(stmt)
+    row = result.one_or_none()
     await db.commit()
-    await db.refresh(db_interview)
-    return db_interview
\ No newline at end of file
+    return row
+
+# --- Interview search ---
+# Spelled exactly like the ix_interviews_overall_score expression so the planner can use it
+_OVERALL_SCORE = literal_column("((interviews.interview_analysis->>'overall_score')::int)", Integer)
+
+async def search_interviews(
+    db: AsyncSession,
+    q: Optional[str] = None,
+    field: str = "all",
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    has_red_flags: Optional[bool] = None,
+    vacancy_id: Optional[uuid.UUID] = None,
+    candidate_id: Optional[uuid.UUID] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    """Full-text search over interview transcripts and analyses.
+
+    `q` uses web search syntax ("reliability -oncall", quoted phrases, OR) and is
+    matched against Interview.search_vector; `field` restricts the match to one
+    part of the interview (red_flags, strengths, weaknesses or transcript) by its
+    weight. Matches are ranked with red flags above strengths above weaknesses
+    above the transcript. Without `q`, the newest interviews matching the filters
+    come first.
+    """
+    interview = models.Interview
+    columns = [
+        interview.id, interview.candidate_id, interview.vacancy_id, interview.interview_name,
+        interview.interview_date, interview.analysis_status, _OVERALL_SCORE.label("overall_score"),
+    ]
+    conditions = []
+    order_by = [interview.interview_date.desc().nulls_last(), interview.id]
+    if q:
+        config = literal_column(f"'{models.INTERVIEW_SEARCH_CONFIG}'::regconfig")
+        query = func.websearch_to_tsquery(config, q)
+        conditions.append(interview.search_vector.op("@@")(query))
+        if field != "all":
+            weight = models.INTERVIEW_SEARCH_WEIGHTS[field].lower()
+            # The GIN probe above finds candidates; ts_filter rechecks only the chosen part
+            conditions.append(func.ts_filter(interview.search_vector, literal_column(f"'{{{weight}}}'")).op("@@")(query))
+        rank = func.ts_rank(interview.search_vector, query)
+        columns += [
+            rank.label("rank"),
+            func.ts_headline(config, interview.interview_text, query, "MaxFragments=2, MaxWords=20, MinWords=5").label("headline"),
+        ]
+        order_by = [rank.desc(), interview.id]
+    if min_score is not None:
+        conditions.append(_OVERALL_SCORE >= bindparam("min_score", min_score, Integer))
+    if max_score is not None:
+        conditions.append(_OVERALL_SCORE <= bindparam("max_score", max_score, Integer))
+    if has_red_flags is not None:
+        any_red_flag = interview.interview_analysis.op("@?")(literal_column("'$.red_flags_identified[0]'"))
+        conditions.append(any_red_flag if has_red_flags else ~any_red_flag)
+    if vacancy_id:
+        conditions.append(interview.vacancy_id == vacancy_id)
+    if candidate_id:
+        conditions.append(interview.candidate_id == candidate_id)
+
+    query = select(*columns).where(*conditions).order_by(*order_by).limit(limit).offset(offset)
+    result = await db.execute(query)
+    return [row._asdict() for row in result]
+
+# --- Interview analysis queue ---
+async def claim_pending_analyses(db: AsyncSession, limit: int, lease_seconds: float) -> List[tuple[uuid.UUID, str, int]]:
+    """Marks up to `limit` due analysis jobs as running and returns (id, text, attempts).
+
+    Jobs are locked with FOR UPDATE SKIP LOCKED so concurrent workers never claim
+    the same interview. A job left running longer than `lease_seconds` (e.g. by a
+    crashed worker) is claimed again.
+    """
+    interview = models.Interview
+    due = or_(
+        and_(interview.analysis_status == ANALYSIS_PENDING, interview.analysis_next_attempt_at <= func.now()),
+        and_(interview.analysis_status == ANALYSIS_RUNNING, interview.updated_at < func.now() - timedelta(seconds=lease_seconds)),
+    )
+    claimable = (
+        select(interview.id)
+        .where(due)
+        .order_by(interview.analysis_next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(interview)
+        .where(interview.id.in_(claimable.scalar_subquery()))
+        .values(analysis_status=ANALYSIS_RUNNING, analysis_attempts=interview.analysis_attempts + 1)
+        .returning(interview.id, interview.interview_text, interview.analysis_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    jobs = result.all()
+    await db.commit()
+    return jobs
+
+async def claim_analysis(
+    db: AsyncSession, interview_id: uuid.UUID, lease_seconds: float, refresh: bool = False,
+) -> Optional[tuple[uuid.UUID, str, int]]:
+    """Marks one interview's analysis as running for a caller that runs it right away.
+
+    Unlike claim_pending_analyses this ignores the retry schedule: a pending or
+    failed job, one without a status (from before the analysis queue), a running
+    job past its lease and, with `refresh`, a done one are claimed. Returns
+    (id, text, attempts), or None if the interview is missing or not claimable
+    (e.g. a worker is analyzing it).
+    """
+    interview = models.Interview
+    claimable = [
+        interview.analysis_status.in_([ANALYSIS_PENDING, ANALYSIS_FAILED]),
+        interview.analysis_status.is_(None),
+        and_(interview.analysis_status == ANALYSIS_RUNNING, interview.updated_at < func.now() - timedelta(seconds=lease_seconds)),
+    ]
+    if refresh:
+        claimable.append(interview.analysis_status == ANALYSIS_DONE)
+    stmt = (
+        update(interview)
+        .where(interview.id == interview_id, or_(*claimable))
+        .values(
+            analysis_status=ANALYSIS_RUNNING,
+            # An explicit request starts failed and finished analyses over
+            analysis_attempts=case(
+                (interview.analysis_status.in_([ANALYSIS_FAILED, ANALYSIS_DONE]), 1),
+                else_=func.coalesce(interview.analysis_attempts, 0) + 1,
+            ),
+        )
+        .returning(interview.id, interview.interview_text, interview.analysis_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    job = result.one_or_none()
+    await db.commit()
+    return job
+
+async def complete_analysis(db: AsyncSession, interview_id: uuid.UUID, analysis_result: schemas.InterviewAnalysis):
+    analysis = analysis_result.model_dump()
+    try:
+        # Lock the row first: the vacancy stats delta depends on the analysis being replaced
+        previous = await vacancy_stats.lock_analyses(db, [interview_id])
+        await db.execute(
+            update(models.Interview)
+            .where(models.Interview.id == interview_id)
+            .values(
+                interview_analysis=analysis, # Store analysis as JSON
+                analysis_status=ANALYSIS_DONE,
+                analysis_error=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await vacancy_stats.apply_deltas(db, vacancy_stats.analysis_deltas(previous, {interview_id: analysis}))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+async def fail_analysis(db: AsyncSession, interview_id: uuid.UUID, error: str, retry_in_seconds: Optional[float]):
+    """Records a failed attempt; the job is re-queued after `retry_in_seconds`, or marked failed if None."""
+    values = {"analysis_error": error[:2000]}
+    if retry_in_seconds is None:
+        values["analysis_status"] = ANALYSIS_FAILED
+    else:
+        values["analysis_status"] = ANALYSIS_PENDING
+        values["analysis_next_attempt_at"] = func.now() + timedelta(seconds=retry_in_seconds)
+    await db.execute(
+        update(models.Interview)
+        .where(models.Interview.id == interview_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+async def store_analyses(db: AsyncSession, results: List[tuple[uuid.UUID, schemas.InterviewAnalysis]]):
+    """Writes many analyses back in one executemany UPDATE and commits once, with their stats deltas."""
+    if not results:
+        return
+    table = models.Interview.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("interview_id"))
+        .values(interview_analysis=bindparam("analysis"), analysis_status=ANALYSIS_DONE, analysis_error=None)
+    )
+    analyses = {interview_id: analysis.model_dump() for interview_id, analysis in results}
+    try:
+        previous = await vacancy_stats.lock_analyses(db, analyses)
+        await db.execute(stmt, [{"interview_id": interview_id, "analysis": analysis} for interview_id, analysis in analyses.items()])
+        await vacancy_stats.apply_deltas(db, vacancy_stats.analysis_deltas(previous, analyses))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+async def requeue_analyses(
+    db: AsyncSession,
+    interview_ids: Optional[List[uuid.UUID]] = None,
+    vacancy_id: Optional[uuid.UUID] = None,
+) -> int:
+    """Puts interviews back on the analysis queue; returns how many were queued.
+
+    Interviews that are currently running are left alone; legacy ones with no
+    status yet are queued too.
+    """
+    stmt = (
+        update(models.Interview)
+        .where(models.Interview.analysis_status.is_distinct_from(ANALYSIS_RUNNING))
+        .values(
+            analysis_status=ANALYSIS_PENDING,
+            analysis_attempts=0,
+            analysis_error=None,
+            analysis_next_attempt_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if interview_ids:
+        stmt = stmt.where(models.Interview.id.in_(interview_ids))
+    if vacancy_id:
+        stmt = stmt.where(models.Interview.vacancy_id == vacancy_id)
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
+
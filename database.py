@@ -1,9 +1,18 @@
 # database.py
+import asyncio
+import logging
 import os
+import time
+import uuid
+from typing import Optional
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool 
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from instrumentation import instrument_engine, record_pool_wait
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,15 +22,238 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-# The async engine for database operations
-engine = create_async_engine(
-    DATABASE_URL,
-    poolclass=NullPool  # <-- Use NullPool to disable SQLAlchemy's pooling
-)
+# Pool settings. DB_POOL_MODE is one of:
+#   "queue"     - a regular SQLAlchemy connection pool per worker process (default)
+#   "pgbouncer" - pooled, but with asyncpg statement caches disabled so it works
+#                 behind PgBouncer in transaction pooling mode
+#   "null"      - no pooling, a fresh connection for every session
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# Connections each API process opens at startup, so first requests skip the handshake
+# (capped at DB_POOL_SIZE; 0 only checks that the database answers)
+DB_POOL_WARM_CONNECTIONS = int(os.getenv("DB_POOL_WARM_CONNECTIONS", str(DB_POOL_SIZE)))
+# Longest /health/ready waits for the database, on a connection of its own
+DB_READY_TIMEOUT = float(os.getenv("DB_READY_TIMEOUT", "2"))
+
+if DB_POOL_MODE not in ("queue", "pgbouncer", "null"):
+    raise ValueError(f"Unknown DB_POOL_MODE: {DB_POOL_MODE}")
+
+class _TimedPoolMixin:
+    """Times every checkout, so the wait for a pooled connection (or, with NullPool,
+    the handshake of a fresh one) shows in PoolMetrics and the request's Server-Timing.
+    Sessions connect lazily, on their first statement, so requests that wait on
+    something else first (an LLM call, a stream) do not hold a connection meanwhile.
+    """
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        connection = super()._do_get()
+        elapsed = time.perf_counter() - started_at
+        pool_metrics.record_acquire(elapsed)
+        record_pool_wait(elapsed)
+        return connection
+
+class _TimedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+class _TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+def _engine_kwargs() -> dict:
+    """Builds create_async_engine() arguments for the configured pool mode."""
+    if DB_POOL_MODE == "pgbouncer":
+        # PgBouncer hands out a different server connection per transaction, so
+        # named prepared statements must be unique and never cached.
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    else:
+        connect_args = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+
+    if DB_POOL_MODE == "null":
+        return {"poolclass": _TimedNullPool, "connect_args": connect_args}
+
+    return {
+        "poolclass": _TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+class PoolMetrics:
+    """Counters for connection checkouts and the time sessions wait to get one."""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.acquire_count = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+
+    def record_acquire(self, seconds: float):
+        self.acquire_count += 1
+        self.acquire_seconds_total += seconds
+        self.acquire_seconds_max = max(self.acquire_seconds_max, seconds)
+
+    def snapshot(self) -> dict:
+        data = {
+            "mode": DB_POOL_MODE,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "acquire_count": self.acquire_count,
+            "acquire_seconds_total": round(self.acquire_seconds_total, 6),
+            "acquire_seconds_avg": round(self.acquire_seconds_total / self.acquire_count, 6) if self.acquire_count else 0.0,
+            "acquire_seconds_max": round(self.acquire_seconds_max, 6),
+        }
+        if DB_POOL_MODE != "null" and _engine is not None:
+            pool = _engine.sync_engine.pool
+            data.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+def _count_pool_events(engine: AsyncEngine):
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_metrics.connects += 1
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checkouts += 1
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_metrics.checkins += 1
+
+# The async engine for database operations; see get_engine
+_engine: Optional[AsyncEngine] = None
+
+def get_engine() -> AsyncEngine:
+    """The process's engine, created on first use: by the app's lifespan, or by a script's first session.
+
+    Building it loads the asyncpg dialect and driver, which importing the app does not need.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(DATABASE_URL, **_engine_kwargs())
+        instrument_engine(_engine)
+        _count_pool_events(_engine)
+        _session_factory.configure(bind=_engine)
+    return _engine
+
+async def dispose_engine():
+    """Closes the pooled connections, if the engine was ever created."""
+    if _engine is not None:
+        await _engine.dispose()
+
+
+class PoolWarmup:
+    """Opens the pool's connections once at startup; the API is ready when it has succeeded."""
+
+    def __init__(self):
+        self.ready = False
+        self.connections = 0
+        self.seconds: Optional[float] = None
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def _open(self, count: int):
+        held = []
+
+        async def check_out():
+            connection = await get_engine().connect()
+            held.append(connection)
+            await connection.execute(text("SELECT 1"))
+
+        try:
+            # All at once, so every connection is a distinct one of the pool
+            results = await asyncio.gather(*(check_out() for _ in range(count)), return_exceptions=True)
+        finally:
+            for connection in held:
+                await connection.close()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def run(self, connections: int):
+        """Retries with backoff until the database answers."""
+        count = max(1, min(connections, DB_POOL_SIZE)) if DB_POOL_MODE != "null" else 1
+        started_at = time.perf_counter()
+        while True:
+            self.attempts += 1
+            try:
+                await self._open(count)
+                break
+            except Exception as e:
+                self.error = str(e)
+                logger.warning("Database not reachable yet (attempt %d): %s", self.attempts, e)
+                await asyncio.sleep(min(10.0, 0.5 * 2 ** self.attempts))
+        self.connections = count
+        self.seconds = round(time.perf_counter() - started_at, 6)
+        self.error = None
+        self.ready = True
+
+    def start(self, connections: int):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(connections))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def snapshot(self) -> dict:
+        return {"ready": self.ready, "connections": self.connections, "seconds": self.seconds,
+                "attempts": self.attempts, "error": self.error}
+
+
+pool_warmup = PoolWarmup()
+
+async def ping(timeout: float = DB_READY_TIMEOUT):
+    """Runs SELECT 1 on a fresh connection outside the pool, so a saturated pool
+    (a busy worker, not a dead database) cannot fail the readiness probe."""
+    import asyncpg
+
+    engine = get_engine()
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    connection = await asyncpg.connect(*cargs, timeout=timeout, **cparams)
+    try:
+        # Simple query protocol: no prepared statement, so it also works behind PgBouncer
+        await asyncio.wait_for(connection.execute("SELECT 1"), timeout)
+    finally:
+        await connection.close(timeout=timeout)
 
+# The async session maker; bound to the engine when get_engine creates it
+_session_factory = async_sessionmaker(class_=AsyncSession, expire_on_commit=False)
 
-# The async session maker
-async_session_local = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+def async_session_local() -> AsyncSession:
+    """A new session on the process's engine."""
+    get_engine()
+    return _session_factory()
 
 # The base class for our ORM models
 Base = declarative_base()
@@ -29,4 +261,4 @@ Base = declarative_base()
 # Dependency to get a DB session in our API endpoints
 async def get_db():
     async with async_session_local() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,126 @@
+# embeddings.py
+"""Local, CPU-only text embeddings for semantic candidate retrieval.
+
+EMBEDDING_BACKEND selects the embedder:
+
+- "hashing" (default): a deterministic hashing vectorizer over words, word
+  bigrams and canonical skill IDs. No model download, microseconds per text,
+  but only lexical similarity (plus skill aliases).
+- "sentence-transformers": any sentence-transformers model (EMBEDDING_MODEL),
+  run on the CPU. Needs `pip install sentence-transformers`.
+
+Vectors are L2-normalized float32, so cosine similarity is a dot product. Each
+stored embedding is tagged with the embedder's `name`; vectors of different
+embedders are never compared.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import List, Optional, Sequence
+import numpy as np
+from skill_vocabulary import vocabulary
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hashing")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))  # Hashing backend only
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Longest text embedded per candidate; long experience descriptions add little
+MAX_TEXT_CHARS = 4000
+
+_TOKEN = re.compile(r"[\w+#]+(?:[.\-/][\w+#]+)*")
+
+
+class HashingEmbedder:
+    """Feature hashing of words, word bigrams and canonical skill IDs into `dim` signed buckets."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing-{dim}-v1"
+        self.cpu_bound = False
+
+    def _bucket(self, feature: str):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest[:4], "little") % self.dim, (1.0 if digest[4] & 1 else -1.0)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = _TOKEN.findall(text.casefold())
+        features = list(tokens)
+        features += [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        # Aliases of one skill ("golang", "go") share a feature
+        for n in (1, 2):
+            for i in range(len(tokens) - n + 1):
+                skill_id = vocabulary.lookup(" ".join(tokens[i:i + n]))
+                if skill_id is not None:
+                    features.append(f"skill:{skill_id}")
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        # Sublinear term frequency, then unit length
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.stack([self.embed_one(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+        self.cpu_bound = True
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            list(texts), batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True, convert_to_numpy=True,
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+_embedder = None
+
+def get_embedder():
+    """The configured embedder, created on first use (loading a model takes seconds)."""
+    global _embedder
+    if _embedder is None:
+        if EMBEDDING_BACKEND == "sentence-transformers":
+            try:
+                _embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+            except ImportError:
+                logger.error("sentence-transformers is not installed; falling back to the hashing embedder")
+        if _embedder is None:
+            _embedder = HashingEmbedder(EMBEDDING_DIM)
+    return _embedder
+
+async def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """Embeds texts as an (n, dim) float32 array; model inference runs in a worker thread."""
+    embedder = get_embedder()
+    if embedder.cpu_bound:
+        return await asyncio.to_thread(embedder.embed, texts)
+    return embedder.embed(texts)
+
+
+def candidate_text(name: Optional[str], summary: Optional[str], skills: Optional[list], experience: Optional[list]) -> str:
+    """The text a candidate is embedded from: title, skills, summary and past positions."""
+    parts = [name or "", ", ".join(skill for skill in skills or [] if isinstance(skill, str)), summary or ""]
+    for job in experience or []:
+        if isinstance(job, dict):
+            parts += [str(job.get("position") or ""), str(job.get("description") or "")]
+    return "\n".join(part for part in parts if part)[:MAX_TEXT_CHARS]
+
+def query_text(role: Optional[str], skills: Optional[List[str]], text: Optional[str] = None) -> str:
+    return "\n".join(part for part in [role or "", ", ".join(skills or []), text or ""] if part)
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f4")
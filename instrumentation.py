@@ -0,0 +1,219 @@
+# instrumentation.py
+import logging
+import os
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+
+logger = logging.getLogger("hr_app.sql")
+
+# Statements slower than this are logged with their duration
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestStats:
+    """Where one request spent its time; mutated in place by the hooks below."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.llm_prompt_tokens = 0
+        self.llm_completion_tokens = 0
+
+    def server_timing(self) -> str:
+        total_ms = (time.perf_counter() - self.started_at) * 1000
+        parts = [
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries"',
+            f"pool;dur={self.pool_wait_seconds * 1000:.1f}",
+        ]
+        if self.llm_calls:
+            parts.append(f'llm;dur={self.llm_seconds * 1000:.1f};desc="{self.llm_calls} calls"')
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class Metrics:
+    """Process-wide counters rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.duration_buckets: Dict[str, list] = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration_sum: Dict[str, float] = defaultdict(float)
+        self.duration_count: Dict[str, int] = defaultdict(int)
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.db_slow_queries = 0
+        self.llm_calls: Dict[str, int] = defaultdict(int)
+        self.llm_seconds: Dict[str, float] = defaultdict(float)
+        self.llm_tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        self.requests[(method, route, status)] += 1
+        self.duration_sum[route] += seconds
+        self.duration_count[route] += 1
+        buckets = self.duration_buckets[route]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+
+
+metrics = Metrics()
+
+
+def instrument_engine(engine):
+    """Counts and times every statement run on the (async) engine."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        metrics.db_queries += 1
+        metrics.db_seconds += elapsed
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.query_count += 1
+            stats.db_seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            metrics.db_slow_queries += 1
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:1000])
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Keep the timing stack balanced when a statement fails
+        started = exception_context.connection.info.get("query_started_at") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def record_pool_wait(seconds: float):
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+
+def record_llm_call(model: str, seconds: float, usage=None):
+    """Records one LLM completion; `usage` is the OpenAI usage object, if any."""
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    metrics.llm_calls[model] += 1
+    metrics.llm_seconds[model] += seconds
+    metrics.llm_tokens[(model, "prompt")] += prompt_tokens
+    metrics.llm_tokens[(model, "completion")] += completion_tokens
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.llm_calls += 1
+        stats.llm_seconds += seconds
+        stats.llm_prompt_tokens += prompt_tokens
+        stats.llm_completion_tokens += completion_tokens
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def render_prometheus() -> str:
+    # Imported lazily: database.py imports this module
+    from database import pool_metrics
+    from llm_cache import llm_cache
+    from llm_providers import llm
+    from pipeline_cache import pipeline_cache
+
+    lines = [
+        "# TYPE http_requests_total counter",
+        *(f"http_requests_total{_labels(method=m, route=r, status=s)} {n}" for (m, r, s), n in metrics.requests.items()),
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for route, buckets in metrics.duration_buckets.items():
+        for bound, count in zip(DURATION_BUCKETS, buckets):
+            lines.append(f"http_request_duration_seconds_bucket{_labels(route=route, le=bound)} {count}")
+        lines.append(f"http_request_duration_seconds_bucket{_labels(route=route, le='+Inf')} {metrics.duration_count[route]}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(route=route)} {metrics.duration_sum[route]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{_labels(route=route)} {metrics.duration_count[route]}")
+
+    lines += [
+        "# TYPE db_queries_total counter",
+        f"db_queries_total {metrics.db_queries}",
+        "# TYPE db_query_duration_seconds_total counter",
+        f"db_query_duration_seconds_total {metrics.db_seconds:.6f}",
+        "# TYPE db_slow_queries_total counter",
+        f"db_slow_queries_total {metrics.db_slow_queries}",
+    ]
+
+    pool = pool_metrics.snapshot()
+    lines += [
+        "# TYPE db_pool_checkouts_total counter",
+        f"db_pool_checkouts_total {pool['checkouts']}",
+        "# TYPE db_pool_connects_total counter",
+        f"db_pool_connects_total {pool['connects']}",
+        "# TYPE db_pool_acquire_seconds summary",
+        f"db_pool_acquire_seconds_sum {pool['acquire_seconds_total']}",
+        f"db_pool_acquire_seconds_count {pool['acquire_count']}",
+    ]
+    if "checked_out" in pool:
+        lines += [
+            "# TYPE db_pool_checked_out gauge",
+            f"db_pool_checked_out {pool['checked_out']}",
+            "# TYPE db_pool_overflow gauge",
+            f"db_pool_overflow {pool['overflow']}",
+        ]
+
+    lines.append("# TYPE llm_requests_total counter")
+    lines += [f"llm_requests_total{_labels(model=model)} {n}" for model, n in metrics.llm_calls.items()]
+    lines.append("# TYPE llm_request_duration_seconds_total counter")
+    lines += [f"llm_request_duration_seconds_total{_labels(model=model)} {s:.6f}" for model, s in metrics.llm_seconds.items()]
+    lines.append("# TYPE llm_tokens_total counter")
+    lines += [f"llm_tokens_total{_labels(model=model, kind=kind)} {n}" for (model, kind), n in metrics.llm_tokens.items()]
+
+    cache = llm_cache.snapshot()
+    lines += [
+        "# TYPE llm_cache_hits_total counter",
+        f"llm_cache_hits_total{_labels(tier='memory')} {cache['memory_hits']}",
+        f"llm_cache_hits_total{_labels(tier='persistent')} {cache['persistent_hits']}",
+        "# TYPE llm_cache_misses_total counter",
+        f"llm_cache_misses_total {cache['misses']}",
+        "# TYPE llm_coalesced_requests_total counter",
+        f"llm_coalesced_requests_total {cache['coalesced']}",
+    ]
+    resilience = llm.stats.snapshot()
+    lines += [
+        "# TYPE llm_retries_total counter",
+        f"llm_retries_total {resilience['retries']}",
+        "# TYPE llm_hedged_requests_total counter",
+        f"llm_hedged_requests_total {resilience['hedges']}",
+        "# TYPE llm_hedge_wins_total counter",
+        f"llm_hedge_wins_total {resilience['hedge_wins']}",
+        "# TYPE llm_fallbacks_total counter",
+        f"llm_fallbacks_total {resilience['fallbacks']}",
+        "# TYPE llm_repaired_responses_total counter",
+        f"llm_repaired_responses_total{_labels(kind='local')} {resilience['repairs']}",
+        f"llm_repaired_responses_total{_labels(kind='reprompt')} {resilience['reprompts']}",
+        "# TYPE llm_deadline_exceeded_total counter",
+        f"llm_deadline_exceeded_total {resilience['deadline_exceeded']}",
+    ]
+
+    pipelines = pipeline_cache.snapshot()
+    lines += [
+        "# TYPE pipeline_cache_hits_total counter",
+        f"pipeline_cache_hits_total {pipelines['hits']}",
+        "# TYPE pipeline_cache_misses_total counter",
+        f"pipeline_cache_misses_total {pipelines['misses']}",
+    ]
+    return "\n".join(lines) + "\n"
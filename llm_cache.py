@@ -0,0 +1,169 @@
+# llm_cache.py
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+# Optional persistent tier shared by all workers on the host; unset to keep memory only
+LLM_CACHE_SQLITE_PATH = os.getenv("LLM_CACHE_SQLITE_PATH")
+
+def normalize_prompt(text: str) -> str:
+    """Collapses whitespace so trivially different submissions share a cache entry."""
+    return " ".join(text.split())
+
+def cache_key(model: str, schema_version: str, prompt: str) -> str:
+    payload = json.dumps([model, schema_version, normalize_prompt(prompt)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class SQLiteTier:
+    """Persistent tier in a local SQLite file; calls run in a thread to keep the loop free."""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _get(self, key: str) -> Optional[str]:
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def _set(self, key: str, value: str):
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl_seconds),
+            )
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str):
+        await asyncio.to_thread(self._set, key, value)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The call runs as its own task, so a caller that goes away (e.g. a client
+    disconnect cancelling its request) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.coalesced = 0
+
+    async def run(self, key: str, call):
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class LLMResponseCache:
+    """Content-addressed cache of raw LLM JSON responses with hit/miss counters."""
+
+    def __init__(self):
+        self.memory = MemoryTier(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+        self.persistent = SQLiteTier(LLM_CACHE_SQLITE_PATH, LLM_CACHE_TTL_SECONDS) if LLM_CACHE_SQLITE_PATH else None
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.single_flight = SingleFlight()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not LLM_CACHE_ENABLED:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.persistent is not None:
+            try:
+                value = await self.persistent.get(key)
+            except sqlite3.Error as e:
+                logger.warning("LLM cache read failed: %s", e)
+                value = None
+            if value is not None:
+                self.persistent_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        if not LLM_CACHE_ENABLED:
+            return
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            try:
+                await self.persistent.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning("LLM cache write failed: %s", e)
+
+    def snapshot(self) -> dict:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "persistent": self.persistent is not None,
+            "entries": len(self.memory.entries),
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "coalesced": self.single_flight.coalesced,
+            "in_flight": len(self.single_flight.in_flight),
+            "hit_ratio": round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,337 @@
+# llm_providers.py
+"""LLM provider abstraction with deadlines, retries, hedging, model fallback and output repair.
+
+LLM_PROVIDER selects the backend: "openai" (default) or "stub", a local provider
+that answers with canned JSON after LLM_STUB_LATENCY_SECONDS, for tests,
+benchmarks and offline development.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, List, NamedTuple, Optional, TypeVar
+from pydantic import ValidationError
+from instrumentation import record_llm_call
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4-1106-preview")
+# Tried in order when the primary model keeps failing; a cheaper/faster model by default
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "gpt-3.5-turbo-1106").split(",") if m.strip()]
+# Limit of a single completion call, and of a whole request including retries and fallbacks
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "30"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # Per model, on transient errors
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# Send a second, identical request if the first has not answered after this long (0 disables);
+# set it around the model's p95 latency to cut the p99 tail
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+# Re-prompts per model when the answer does not validate against the response schema
+LLM_REPAIR_ATTEMPTS = int(os.getenv("LLM_REPAIR_ATTEMPTS", "1"))
+LLM_STUB_LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "0"))
+
+SYSTEM_PROMPT = "You are a helpful assistant designed to output JSON."
+
+def transient_errors() -> tuple:
+    """Errors worth retrying or falling back on; anything else (auth, bad request) is raised at once."""
+    # openai takes over half a second to import, so only OpenAIProvider imports it, on first use;
+    # until then none of its errors can occur
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return (asyncio.TimeoutError,)
+    return (
+        asyncio.TimeoutError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+def is_rate_limited(error: Optional[BaseException]) -> bool:
+    """Whether `error`, or an error it was raised from, is the provider's rate limiting."""
+    openai = sys.modules.get("openai")
+    while openai is not None and error is not None:
+        if isinstance(error, openai.RateLimitError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+Parsed = TypeVar("Parsed")
+
+
+class Completion(NamedTuple):
+    content: str
+    model: str
+    usage: Any
+
+
+class OpenAIProvider:
+    """OpenAI chat completions in JSON mode. The client is created on first use."""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+            # Retries and timeouts are handled by ResilientLLM
+            self._client = openai.AsyncOpenAI(max_retries=0, timeout=LLM_ATTEMPT_TIMEOUT_SECONDS)
+        return self._client
+
+    async def complete(self, model: str, messages: List[dict]) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=model, messages=messages, response_format={"type": "json_object"},
+        )
+        return Completion(response.choices[0].message.content, model, response.usage)
+
+    async def stream(self, model: str, messages: List[dict]) -> AsyncIterator[Completion]:
+        """Yields the completion as text deltas; the last chunk carries the usage."""
+        response = await self.client.chat.completions.create(
+            model=model, messages=messages, response_format={"type": "json_object"},
+            stream=True, stream_options={"include_usage": True},
+        )
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta or chunk.usage:
+                yield Completion(delta or "", model, chunk.usage)
+
+
+ASSESSMENT_ASPECTS = [
+    "Core Technical Skills", "Problem-Solving Ability", "Past Project Experience", "Technical Depth",
+    "Communication & Clarity", "Motivation & Drive", "Team Collaboration & Attitude", "Reliability & Ownership",
+]
+
+def stub_answer(prompt: str) -> dict:
+    if "Interview Text" in prompt:
+        return {
+            "strengths": ["Clear communication"],
+            "weaknesses": ["Limited system design depth"],
+            "assessment_aspects": {aspect: "Good" for aspect in ASSESSMENT_ASPECTS},
+            "red_flags_identified": [],
+            "overall_score": 70,
+        }
+    return {"role": "Developer", "skills": ["Python", "SQL"], "experience_years": "3-5 years"}
+
+
+class StubProvider:
+    """Answers with canned, schema-valid JSON after a configurable delay."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+
+    def _answer(self, model: str, messages: List[dict]) -> Completion:
+        prompt = messages[-1]["content"]
+        content = json.dumps(stub_answer(prompt))
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return Completion(content, model, usage)
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    async def complete(self, model: str, messages: List[dict]) -> Completion:
+        await asyncio.sleep(self._delay())
+        return self._answer(model, messages)
+
+    async def stream(self, model: str, messages: List[dict]) -> AsyncIterator[Completion]:
+        """The same answer in small chunks, spread over the same delay."""
+        completion = self._answer(model, messages)
+        chunks = [completion.content[i:i + 16] for i in range(0, len(completion.content), 16)]
+        delay = self._delay() / len(chunks)
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(delay)
+            yield Completion(chunk, model, completion.usage if i == len(chunks) - 1 else None)
+
+
+def extract_json(content: str) -> str:
+    """Local repair: strips code fences and text around the outermost JSON object."""
+    content = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    start, end = content.find("{"), content.rfind("}")
+    return content[start:end + 1] if start != -1 and end > start else content
+
+
+class LLMStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.repairs = 0
+        self.reprompts = 0
+        self.deadline_exceeded = 0
+
+    def snapshot(self) -> dict:
+        return dict(vars(self))
+
+
+class ResilientLLM:
+    def __init__(self, provider, model: str, fallback_models: List[str]):
+        self.provider = provider
+        self.models = [model, *[m for m in fallback_models if m != model]]
+        self.stats = LLMStats()
+
+    async def _backoff(self, retries: int, deadline: float):
+        self.stats.retries += 1
+        backoff = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** retries))
+        await asyncio.sleep(min(backoff, max(0.0, deadline - asyncio.get_running_loop().time())))
+
+    async def _call(self, model: str, messages: List[dict], timeout: float) -> Completion:
+        self.stats.calls += 1
+        started_at = time.perf_counter()
+        completion = await asyncio.wait_for(self.provider.complete(model, messages), timeout)
+        record_llm_call(model, time.perf_counter() - started_at, completion.usage)
+        return completion
+
+    async def _hedged_call(self, model: str, messages: List[dict], timeout: float) -> Completion:
+        """One call, plus a duplicate if the first is slower than LLM_HEDGE_AFTER_SECONDS; first success wins."""
+        first = asyncio.ensure_future(self._call(model, messages, timeout))
+        if LLM_HEDGE_AFTER_SECONDS <= 0 or LLM_HEDGE_AFTER_SECONDS >= timeout:
+            return await first
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=LLM_HEDGE_AFTER_SECONDS)
+            if done:
+                return first.result()
+            self.stats.hedges += 1
+            pending.add(asyncio.ensure_future(self._call(model, messages, timeout - LLM_HEDGE_AFTER_SECONDS)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete_json(self, prompt: str, parse: Callable[[str], Parsed]) -> Parsed:
+        """Completes `prompt` and returns `parse(content)`.
+
+        `parse` raises ValueError / ValidationError for unusable output. Transient
+        errors are retried with jittered exponential backoff, then the next model
+        is tried; invalid output is repaired locally or re-prompted with the error.
+        Everything happens within LLM_DEADLINE_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_DEADLINE_SECONDS
+        error: Optional[BaseException] = None
+        for index, model in enumerate(self.models):
+            if index:
+                self.stats.fallbacks += 1
+                logger.warning("Falling back to %s after: %r", model, error)
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+            retries = reprompts = 0
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.stats.deadline_exceeded += 1
+                    raise error or asyncio.TimeoutError("LLM deadline exceeded")
+                try:
+                    completion = await self._hedged_call(model, messages, min(LLM_ATTEMPT_TIMEOUT_SECONDS, remaining))
+                except transient_errors() as e:
+                    error = e
+                    if retries >= LLM_MAX_RETRIES:
+                        break
+                    retries += 1
+                    await self._backoff(retries, deadline)
+                    continue
+
+                try:
+                    return parse(completion.content)
+                except (ValueError, ValidationError) as e:
+                    error = e
+                try:
+                    parsed = parse(extract_json(completion.content))
+                    self.stats.repairs += 1
+                    return parsed
+                except (ValueError, ValidationError):
+                    pass
+                if reprompts >= LLM_REPAIR_ATTEMPTS:
+                    break
+                reprompts += 1
+                self.stats.reprompts += 1
+                messages = messages + [
+                    {"role": "assistant", "content": completion.content},
+                    {"role": "user", "content": (
+                        f"That response is not valid: {str(error)[:1000]}\n"
+                        "Reply with only the corrected JSON object, with exactly the requested keys and types."
+                    )},
+                ]
+        raise error
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Streams the completion of `prompt` as text deltas.
+
+        Retries and fallbacks work as in complete_json, but only until the first
+        delta has been yielded; a failure after that is raised to the caller. Each
+        delta must arrive within LLM_ATTEMPT_TIMEOUT_SECONDS, and the whole stream
+        within LLM_DEADLINE_SECONDS. Streams are not hedged.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_DEADLINE_SECONDS
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+        error: Optional[BaseException] = None
+        for index, model in enumerate(self.models):
+            if index:
+                self.stats.fallbacks += 1
+                logger.warning("Falling back to %s after: %r", model, error)
+            retries = 0
+            while True:
+                self.stats.calls += 1
+                started_at = time.perf_counter()
+                chunks = self.provider.stream(model, messages)
+                usage = None
+                received = False
+                try:
+                    while True:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            self.stats.deadline_exceeded += 1
+                            raise asyncio.TimeoutError("LLM deadline exceeded")
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), min(LLM_ATTEMPT_TIMEOUT_SECONDS, remaining))
+                        except StopAsyncIteration:
+                            break
+                        usage = chunk.usage or usage
+                        if chunk.content:
+                            received = True
+                            yield chunk.content
+                except transient_errors() as e:
+                    if received or deadline <= loop.time():
+                        raise
+                    error = e
+                    if retries >= LLM_MAX_RETRIES:
+                        break
+                    retries += 1
+                    await self._backoff(retries, deadline)
+                    continue
+                finally:
+                    await chunks.aclose()
+                record_llm_call(model, time.perf_counter() - started_at, usage)
+                return
+        raise error
+
+
+def _make_provider():
+    if LLM_PROVIDER == "stub":
+        return StubProvider(LLM_STUB_LATENCY_SECONDS)
+    return OpenAIProvider()
+
+llm = ResilientLLM(_make_provider(), LLM_MODEL, LLM_FALLBACK_MODELS)
+
+def set_provider(provider):
+    """Swaps the provider, e.g. for a StubProvider in tests and benchmarks."""
+    llm.provider = provider
@@ -1,15 +1,54 @@
 # llm_service.py
 import os
 import json
-from openai import AsyncOpenAI
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Any, AsyncIterator, Tuple, Type, TypeVar
+from pydantic import BaseModel
 import schemas
+from llm_cache import llm_cache, cache_key
+from llm_providers import LLM_MODEL, extract_json, llm
+from partial_json import PartialJSONParser
 
-# Initialize the AsyncOpenAI client
-# It automatically reads the OPENAI_API_KEY from the environment
-client = AsyncOpenAI()
+logger = logging.getLogger(__name__)
+
+ResponseSchema = TypeVar("ResponseSchema", bound=BaseModel)
+
+@lru_cache(maxsize=None)
+def _schema_version(schema_cls: Type[BaseModel]) -> str:
+    """A short fingerprint of the response schema, so changing it invalidates cached answers.
+
+    Memoized per class: building and hashing the JSON schema costs more than a cache lookup.
+    """
+    schema_json = json.dumps(schema_cls.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema_json.encode("utf-8")).hexdigest()[:16]
+
+async def _complete_json(prompt: str, schema_cls: Type[ResponseSchema], refresh: bool = False) -> ResponseSchema:
+    """Runs a JSON-mode completion, serving repeated prompts from the response cache.
+
+    Identical prompts already in flight share that call instead of starting another.
+    With `refresh`, the cached answer is ignored and replaced by a new one.
+    """
+    key = cache_key(LLM_MODEL, _schema_version(schema_cls), prompt)
+    content = None if refresh else await llm_cache.get(key)
+    if content is None:
+        content = await llm_cache.single_flight.run(key, lambda: _fetch_json(key, prompt, schema_cls))
+    return schema_cls.model_validate_json(content)
+
+async def _fetch_json(key: str, prompt: str, schema_cls: Type[ResponseSchema]) -> str:
+    def parse(content: str) -> str:
+        # Returns the (possibly repaired) JSON text once it validates against the schema
+        return schema_cls.model_validate_json(content).model_dump_json()
+
+    content = await llm.complete_json(prompt, parse)
+    # Only answers that validate against the schema are cached
+    await llm_cache.set(key, content)
+    return content
 
 async def parse_search_query(description: str) -> schemas.SearchDescriptionParseResponse:
     """Parses a natural language job description into structured search filters."""
+    description = description.strip()
     prompt = f"""
     You are an expert HR assistant specializing in parsing recruitment queries.
     Analyze the following job description and extract the key search parameters.
@@ -25,24 +64,13 @@ async def parse_search_query(description: str) -> schemas.SearchDescriptionParse
     Your response must be only the JSON object, without any other text or explanations.
     """
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4-1106-preview",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant designed to output JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message.content
-        parsed_json = json.loads(content)
-        return schemas.SearchDescriptionParseResponse(**parsed_json)
+        return await _complete_json(prompt, schemas.SearchDescriptionParseResponse)
     except Exception as e:
-        print(f"Error calling OpenAI for search query parsing: {e}")
+        logger.error("Error calling OpenAI for search query parsing: %s", e)
         raise
 
-async def analyze_interview_text(interview_text: str) -> schemas.InterviewAnalysis:
-    """Analyzes interview text and provides a structured assessment."""
-    prompt = f"""
+def _interview_analysis_prompt(interview_text: str) -> str:
+    return f"""
     You are a senior technical recruiter and talent assessor. Analyze the following interview transcript/summary.
     Based *only* on the text provided, provide a detailed, structured analysis.
 
@@ -57,18 +85,44 @@ async def analyze_interview_text(interview_text: str) -> schemas.InterviewAnalys
 
     Your response must be only the JSON object.
     """
+
+async def analyze_interview_text(interview_text: str, refresh: bool = False) -> schemas.InterviewAnalysis:
+    """Analyzes interview text and provides a structured assessment; `refresh` asks the model again."""
+    prompt = _interview_analysis_prompt(interview_text.strip())
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4-1106-preview",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant designed to output JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message.content
-        parsed_json = json.loads(content)
-        return schemas.InterviewAnalysis(**parsed_json)
+        return await _complete_json(prompt, schemas.InterviewAnalysis, refresh)
     except Exception as e:
-        print(f"Error calling OpenAI for interview analysis: {e}")
-        raise
\ No newline at end of file
+        logger.error("Error calling OpenAI for interview analysis: %s", e)
+        raise
+
+async def stream_interview_analysis(interview_text: str) -> AsyncIterator[Tuple[tuple, Any]]:
+    """Streams an interview analysis as (path, value) pairs as parts of it complete.
+
+    Paths are ("strengths", 0) for list items, ("assessment_aspects", aspect) for
+    ratings and ("overall_score",) for whole fields. The last pair is
+    ((), InterviewAnalysis): the validated result, which is also cached like
+    analyze_interview_text's.
+    """
+    prompt = _interview_analysis_prompt(interview_text.strip())
+    key = cache_key(LLM_MODEL, _schema_version(schemas.InterviewAnalysis), prompt)
+    parser = PartialJSONParser(max_depth=2)
+    content = await llm_cache.get(key)
+    try:
+        if content is None:
+            chunks = []
+            async for delta in llm.stream(prompt):
+                chunks.append(delta)
+                for path, value in parser.feed(delta):
+                    if path:
+                        yield path, value
+            analysis = schemas.InterviewAnalysis.model_validate_json(extract_json("".join(chunks)))
+            await llm_cache.set(key, analysis.model_dump_json())
+        else:
+            for path, value in parser.feed(content):
+                if path:
+                    yield path, value
+            analysis = schemas.InterviewAnalysis.model_validate_json(content)
+    except Exception as e:
+        logger.error("Error streaming OpenAI interview analysis: %s", e)
+        raise
+    yield (), analysis
@@ -1,19 +1,37 @@
 # main.py
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine
-from database import Base
-from routers import candidates, vacancies, interviews, search
-import os
-
-# Create a synchronous engine for the initial table creation
-# This is a simple approach for development. For production, use Alembic migrations.
-DATABASE_URL_SYNC = os.getenv("DATABASE_URL", "").replace("asyncpg", "psycopg2")
-if DATABASE_URL_SYNC:
-    engine_sync = create_engine(DATABASE_URL_SYNC)
-    Base.metadata.create_all(bind=engine_sync)
+import database
+from routers import candidates, vacancies, interviews, search, health
+import analysis_worker
+import vacancy_stats
+from cpu_pool import cpu_pool
+from instrumentation import RequestStats, current_request_stats, metrics, render_prometheus
+
+# The schema is managed by `python -m schema --upgrade`, run once per deploy rather than by
+# every worker at startup. Importing the app builds no engine; the lifespan does, and only
+# the pool warmup, which runs in the background, connects before the first request:
+# /health/ready reports when it is done.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.get_engine()
+    database.pool_warmup.start(database.DB_POOL_WARM_CONNECTIONS)
+    # Interview analyses queued by /interviews/schedule are processed in the background
+    if analysis_worker.ANALYSIS_WORKER_IN_PROCESS:
+        analysis_worker.worker.start()
+    vacancy_stats.periodic_rebuild.start(vacancy_stats.VACANCY_STATS_REBUILD_SECONDS)
+    yield
+    await vacancy_stats.periodic_rebuild.stop()
+    await analysis_worker.worker.stop()
+    await database.pool_warmup.stop()
+    await database.dispose_engine()
+    cpu_pool.shutdown()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="HR Application Backend",
     description="API for managing candidates, vacancies, and interviews with LLM integration.",
     version="1.0.0"
@@ -35,12 +53,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Collects query count, DB time, pool wait and LLM time for this request
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        current_request_stats.reset(token)
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    metrics.observe_request(request.method, route_path, response.status_code, time.perf_counter() - stats.started_at)
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
 # Include all the routers
 app.include_router(search.router)
 app.include_router(candidates.router)
 app.include_router(vacancies.router)
 app.include_router(interviews.router)
+app.include_router(health.router)
 
 @app.get("/", tags=["Root"])
 async def read_root():
-    return {"message": "Welcome to the HR Application API!"}
\ No newline at end of file
+    return {"message": "Welcome to the HR Application API!"}
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
@@ -0,0 +1,142 @@
+# matching.py
+import heapq
+import os
+from itertools import chain
+from typing import List, Optional, Sequence
+import numpy as np
+from sqlalchemy import Integer, Text, literal, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+from crud import parse_experience_years
+from skill_vocabulary import fold, vocabulary
+
+# Candidates are scored in batches of this many rows streamed from a server-side cursor
+MATCH_BATCH_SIZE = int(os.getenv("MATCH_BATCH_SIZE", "2000"))
+
+# Relative weight of skill overlap vs. experience fit in the final score
+SKILL_WEIGHT = float(os.getenv("MATCH_SKILL_WEIGHT", "0.8"))
+EXPERIENCE_WEIGHT = 1.0 - SKILL_WEIGHT
+
+def _mark_hits(hits: np.ndarray, value_lists, keys: np.ndarray, columns: np.ndarray):
+    """Sets hits[row, columns[j]] wherever row's values contain keys[j], with one np.isin over the batch."""
+    lengths = np.fromiter((len(values or ()) for values in value_lists), dtype=np.int64, count=len(value_lists))
+    if not lengths.any():
+        return
+    flat = np.array(list(chain.from_iterable(values or () for values in value_lists)), dtype=keys.dtype)
+    rows = np.repeat(np.arange(len(value_lists)), lengths)
+    found = np.isin(flat, keys)
+    order = np.argsort(keys)
+    hits[rows[found], columns[order[np.searchsorted(keys, flat[found], sorter=order)]]] = True
+
+
+class VacancyMatcher:
+    """Scores candidates against a vacancy's required skills and experience range.
+
+    The skill score is the fraction of the vacancy's skills a candidate has. Skills
+    in the vocabulary are compared by ID against the candidates' stored skill_ids,
+    unknown ones by folded name; each batch of candidates is turned into a boolean
+    (candidates x required skills) matrix with a vectorized membership test.
+    """
+
+    def __init__(self, required_skills: Optional[Sequence[str]], requirements_experience: Optional[str]):
+        self.skill_names = []
+        keys = []
+        for skill in required_skills or []:
+            if not isinstance(skill, str) or not skill.strip():
+                continue
+            key = vocabulary.key(skill)
+            if key not in keys:
+                keys.append(key)
+                self.skill_names.append(skill)
+        known = [column for column, key in enumerate(keys) if isinstance(key, int)]
+        unknown = [column for column, key in enumerate(keys) if not isinstance(key, int)]
+        self.known_columns, self.known_ids = np.array(known, dtype=np.intp), np.array([keys[c] for c in known], dtype=np.int64)
+        self.unknown_columns, self.unknown_names = np.array(unknown, dtype=np.intp), np.array([keys[c] for c in unknown], dtype=object)
+        self.experience_range = parse_experience_years(requirements_experience)
+
+    def skill_hits(self, skill_id_lists: Sequence[Optional[Sequence[int]]], skill_lists: Sequence[Optional[Sequence[str]]]) -> np.ndarray:
+        hits = np.zeros((len(skill_lists), len(self.skill_names)), dtype=bool)
+        if self.known_ids.size:
+            _mark_hits(hits, skill_id_lists, self.known_ids, self.known_columns)
+        if self.unknown_names.size:
+            folded = [[fold(skill) for skill in skills or () if isinstance(skill, str)] for skills in skill_lists]
+            _mark_hits(hits, folded, self.unknown_names, self.unknown_columns)
+        return hits
+
+    def experience_fit(self, experience_months: Sequence[Optional[int]]) -> np.ndarray:
+        """1.0 inside the required range, decaying linearly outside it; 0.0 when unknown."""
+        months = np.array([np.nan if m is None else m for m in experience_months], dtype=np.float64)
+        if self.experience_range is None:
+            return np.ones(len(months))
+        min_months, max_months = self.experience_range
+        fit = np.ones(len(months))
+        if min_months > 0:
+            below = months < min_months
+            fit[below] = months[below] / min_months
+        if max_months != float('inf'):
+            above = months > max_months
+            fit[above] = np.maximum(0.0, 1.0 - (months[above] - max_months) / max(max_months, 12))
+        fit[np.isnan(months)] = 0.0
+        return np.clip(fit, 0.0, 1.0)
+
+    def score(self, skill_id_lists, skill_lists, experience_months):
+        hits = self.skill_hits(skill_id_lists, skill_lists)
+        skill_score = hits.sum(axis=1, dtype=np.float32) / max(1, len(self.skill_names))
+        scores = SKILL_WEIGHT * skill_score + EXPERIENCE_WEIGHT * self.experience_fit(experience_months)
+        return scores, hits
+
+
+async def match_candidates(db: AsyncSession, vacancy: models.Vacancy, top_k: int) -> List[dict]:
+    """Returns the top_k best-matching candidates for a vacancy, best first.
+
+    Only the columns needed for scoring are streamed, batch by batch, and a
+    bounded heap keeps the running top_k, so memory does not grow with the table.
+    Only candidates sharing at least one of the vacancy's skills are read (a GIN
+    index probe instead of a full scan); a vacancy without skills has no matches,
+    since ranking by experience alone would read the whole table.
+    """
+    matcher = VacancyMatcher(vacancy.requirements_skills, vacancy.requirements_experience)
+    if not matcher.skill_names:
+        return []
+    candidate = models.Candidate
+    names, ids = vocabulary.canonicalize(matcher.skill_names)
+    conditions = [candidate.skills.has_any(literal(names, ARRAY(Text)))]
+    if ids:
+        conditions.append(candidate.skill_ids.overlap(literal(ids, ARRAY(Integer))))
+    query = select(
+        candidate.id, candidate.name, candidate.status, candidate.main_url,
+        candidate.skills, candidate.skill_ids, candidate.total_experience_months,
+    ).where(or_(*conditions))
+
+    heap = []  # (score, sequence, row, hit_columns); the smallest score is evicted first
+    sequence = 0
+    result = await db.stream(query.execution_options(yield_per=MATCH_BATCH_SIZE))
+    async for rows in result.partitions():
+        scores, hits = matcher.score(
+            [row.skill_ids for row in rows], [row.skills for row in rows], [row.total_experience_months for row in rows],
+        )
+        if len(rows) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = range(len(rows))
+        for i in best:
+            entry = (float(scores[i]), sequence, rows[i], hits[i])
+            sequence += 1
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+    matches = []
+    for score, _, row, hit_columns in sorted(heap, key=lambda entry: (-entry[0], entry[1])):
+        matches.append({
+            "id": row.id,
+            "name": row.name,
+            "status": row.status,
+            "main_url": row.main_url,
+            "total_experience_months": row.total_experience_months,
+            "score": round(score, 4),
+            "matched_skills": [matcher.skill_names[i] for i in np.flatnonzero(hit_columns)],
+        })
+    return matches
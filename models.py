@@ -1,10 +1,35 @@
 # models.py
+import os
 import uuid
-from sqlalchemy import Column, String, Text, Integer, TIMESTAMP, Date, ForeignKey, func
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Computed, Float, LargeBinary, String, Text, Integer, TIMESTAMP, Date, ForeignKey, Index, DDL, event, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from database import Base
 
+# Trigram indexes (used for ILIKE '%...%' matches) need the pg_trgm extension
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+# Text search configuration of Interview.search_vector; queries must use the same one.
+# Changing it requires recreating the column.
+INTERVIEW_SEARCH_CONFIG = os.getenv("INTERVIEW_SEARCH_CONFIG", "english")
+
+# Weight of each searchable part of an interview in search_vector (ts_filter selects by it)
+INTERVIEW_SEARCH_WEIGHTS = {"red_flags": "A", "strengths": "B", "weaknesses": "C", "transcript": "D"}
+
+def _analysis_tsvector(key: str, weight: str) -> str:
+    return (
+        f"setweight(jsonb_to_tsvector('{INTERVIEW_SEARCH_CONFIG}'::regconfig, "
+        f"coalesce(interview_analysis->'{key}', '[]'::jsonb), '[\"string\"]'), '{weight}')"
+    )
+
+_INTERVIEW_SEARCH_VECTOR = " || ".join([
+    _analysis_tsvector("red_flags_identified", INTERVIEW_SEARCH_WEIGHTS["red_flags"]),
+    _analysis_tsvector("strengths", INTERVIEW_SEARCH_WEIGHTS["strengths"]),
+    _analysis_tsvector("weaknesses", INTERVIEW_SEARCH_WEIGHTS["weaknesses"]),
+    f"setweight(to_tsvector('{INTERVIEW_SEARCH_CONFIG}'::regconfig, coalesce(interview_text, '')), "
+    f"'{INTERVIEW_SEARCH_WEIGHTS['transcript']}')",
+])
+
 class Candidate(Base):
     __tablename__ = "candidates"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -12,12 +37,21 @@ class Candidate(Base):
     email = Column(String(255), unique=True, index=True)
     phone = Column(String(50))
     summary = Column(Text)
-    skills = Column(JSONB)
+    skills = Column(JSONB)  # Canonical names (see skill_vocabulary) plus unknown skills as written
+    skill_ids = Column(ARRAY(Integer))  # Vocabulary IDs of the known skills, sorted
     experience = Column(JSONB)
     education = Column(JSONB)
     main_url = Column(Text)
     total_experience_months = Column(Integer)
     status = Column(String(50), default="New")
+    # float32 text embedding (see embeddings.py) and the embedder that produced it
+    embedding = deferred(Column(LargeBinary))
+    embedding_model = Column(String(100))
+    # Duplicate detection fingerprints (see candidate_dedup)
+    url_key = Column(Text)  # Normalized main_url
+    fingerprint = Column(String(64))  # SHA-256 of the normalized resume content, if it has experience
+    minhash = deferred(Column(LargeBinary))  # MinHash signature of skills and experience
+    lsh_bands = Column(ARRAY(BigInteger))  # LSH band hashes of the signature
     vacancy_id = Column(UUID(as_uuid=True), ForeignKey("vacancies.id"), nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -25,6 +59,21 @@ class Candidate(Base):
     vacancy = relationship("Vacancy")
     interviews = relationship("Interview", back_populates="candidate")
 
+    __table_args__ = (
+        # jsonb_ops GIN index serves both `skills @> '["x"]'` and `skills ?| array[...]`
+        Index("ix_candidates_skills_gin", "skills", postgresql_using="gin"),
+        # Serves `skill_ids && array[...]` (any of) and `skill_ids @> array[...]` (all of)
+        Index("ix_candidates_skill_ids_gin", "skill_ids", postgresql_using="gin"),
+        Index("ix_candidates_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        # The semantic index polls for candidates written since its last build
+        Index("ix_candidates_updated_at", "updated_at"),
+        # Not unique: duplicates imported before deduplication exist until collapsed
+        Index("ix_candidates_url_key", "url_key"),
+        Index("ix_candidates_fingerprint", "fingerprint"),
+        # Serves `lsh_bands && array[...]`: candidates sharing any band with a new resume
+        Index("ix_candidates_lsh_bands_gin", "lsh_bands", postgresql_using="gin"),
+    )
+
 class Vacancy(Base):
     __tablename__ = "vacancies"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -33,10 +82,19 @@ class Vacancy(Base):
     responsibilities = Column(JSONB)
     requirements_experience = Column(String(50))
     requirements_skills = Column(JSONB)
+    requirement_skill_ids = Column(ARRAY(Integer))
     status = Column(String(50), default="Open")
+    external_id = Column(String(255), unique=True, index=True)  # Stable job-board key used for upserts
+    content_hash = Column(String(64))  # SHA-256 of the imported content, to skip unchanged rows
+    # Bumped whenever the vacancy's candidate pipeline changes; backs the pipeline cache and ETag
+    pipeline_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_vacancies_requirement_skill_ids_gin", "requirement_skill_ids", postgresql_using="gin"),
+    )
+
 class Interview(Base):
     __tablename__ = "interviews"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -46,8 +104,39 @@ class Interview(Base):
     interview_date = Column(TIMESTAMP)
     interview_text = Column(Text)
     interview_analysis = Column(JSONB)
+    analysis_status = Column(String(20), default="pending")  # pending / running / done / failed
+    analysis_attempts = Column(Integer, default=0)
+    analysis_error = Column(Text)
+    analysis_next_attempt_at = Column(TIMESTAMP, server_default=func.now())
+    # Generated by Postgres from the transcript and analysis, so it is current after every write
+    # (deferred: only the search query reads it)
+    search_vector = deferred(Column(TSVECTOR, Computed(_INTERVIEW_SEARCH_VECTOR, persisted=True)))
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
     candidate = relationship("Candidate", back_populates="interviews")
-    vacancy = relationship("Vacancy")
\ No newline at end of file
+    vacancy = relationship("Vacancy")
+
+    __table_args__ = (
+        # The analysis queue polls for due jobs by status and next attempt time
+        Index("ix_interviews_analysis_queue", "analysis_status", "analysis_next_attempt_at"),
+        Index("ix_interviews_search_vector", "search_vector", postgresql_using="gin"),
+        # jsonb_path_ops GIN serves containment and jsonpath tests on the analysis, e.g.
+        # interview_analysis @? '$.red_flags_identified[0]' (has red flags)
+        Index(
+            "ix_interviews_analysis_path", "interview_analysis",
+            postgresql_using="gin", postgresql_ops={"interview_analysis": "jsonb_path_ops"},
+        ),
+        Index("ix_interviews_overall_score", text("((interview_analysis->>'overall_score')::int)")),
+    )
+
+class VacancyStat(Base):
+    """One aggregate counter of a vacancy's interviews, e.g. (funnel, analyzed) or (score, sum).
+
+    Maintained incrementally by vacancy_stats.py and rebuilt from scratch periodically.
+    """
+    __tablename__ = "vacancy_stats"
+    vacancy_id = Column(UUID(as_uuid=True), ForeignKey("vacancies.id"), primary_key=True)
+    metric = Column(String(100), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    value = Column(Float, nullable=False, default=0)
@@ -0,0 +1,101 @@
+# partial_json.py
+import json
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, path: tuple, start: int):
+        self.kind = kind  # "object" or "array"
+        self.path = path
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "object"
+
+    def child_path(self) -> tuple:
+        return self.path + ((self.key,) if self.kind == "object" else (self.index,))
+
+
+class PartialJSONParser:
+    """Incremental JSON parser for streamed completions.
+
+    `feed()` takes the next chunk of text and returns (path, value) for every value
+    completed by it whose path has at most `max_depth` elements, innermost first:
+    `{"strengths": ["a", "b"]}` yields (("strengths", 0), "a"), (("strengths", 1), "b"),
+    (("strengths",), ["a", "b"]) and ((), {...}). Each character is scanned once; only
+    completed values are decoded. Text before the first "{" or "[" (e.g. a code
+    fence) is skipped.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.buffer = ""
+        self.position = 0
+        self.stack: List[_Frame] = []
+        self.in_string = False
+        self.escaped = False
+        self.value_start: Optional[int] = None  # start of the string or scalar being scanned
+        self.done = False
+
+    def _path(self) -> tuple:
+        return self.stack[-1].child_path() if self.stack else ()
+
+    def _complete(self, start: int, end: int, path: tuple, events: list):
+        if len(path) <= self.max_depth:
+            events.append((path, json.loads(self.buffer[start:end])))
+
+    def _end_scalar(self, end: int, events: list):
+        if self.value_start is not None:
+            self._complete(self.value_start, end, self._path(), events)
+            self.value_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[tuple, Any]]:
+        events: List[Tuple[tuple, Any]] = []
+        self.buffer += chunk
+        buffer = self.buffer
+        i = self.position
+        while i < len(buffer) and not self.done:
+            char = buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    frame = self.stack[-1] if self.stack else None
+                    if frame is not None and frame.kind == "object" and frame.expect_key:
+                        frame.key = json.loads(buffer[self.value_start:i + 1])
+                        frame.expect_key = False
+                    else:
+                        self._complete(self.value_start, i + 1, self._path(), events)
+                    self.value_start = None
+            elif not self.stack and char not in "{[":
+                pass  # Preamble before the root value
+            elif char == '"':
+                self.in_string = True
+                self.value_start = i
+            elif char in "{[":
+                self.stack.append(_Frame("object" if char == "{" else "array", self._path(), i))
+            elif char in "}]":
+                self._end_scalar(i, events)
+                frame = self.stack.pop()
+                if len(frame.path) <= self.max_depth:
+                    events.append((frame.path, json.loads(buffer[frame.start:i + 1])))
+                self.done = not self.stack
+            elif char == ",":
+                self._end_scalar(i, events)
+                frame = self.stack[-1]
+                frame.index += 1
+                frame.expect_key = frame.kind == "object"
+            elif char in _WHITESPACE or char == ":":
+                self._end_scalar(i, events)
+            elif self.value_start is None:
+                self.value_start = i  # Number, true, false or null
+            i += 1
+        self.position = i
+        return events
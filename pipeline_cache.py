@@ -0,0 +1,55 @@
+# pipeline_cache.py
+import os
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Per-process cache of vacancy pipelines (GET /vacancies/{id}/candidates)
+PIPELINE_CACHE_MAX_ENTRIES = int(os.getenv("PIPELINE_CACHE_MAX_ENTRIES", "1024"))
+
+def etag(vacancy_id: uuid.UUID, version: int) -> str:
+    return f'"{vacancy_id.hex}-{version}"'
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in candidates or any(value.removeprefix("W/") == tag for value in candidates)
+
+
+class PipelineCache:
+    """LRU of vacancy pipelines keyed by vacancy ID and tagged with Vacancy.pipeline_version.
+
+    Writers that change a pipeline bump the vacancy's pipeline_version in the same
+    transaction, so an entry is valid exactly while its version matches the
+    stored one. Checking it is a primary-key read, which also makes the cache
+    safe to keep in every worker process without cross-process invalidation.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, vacancy_id: uuid.UUID, version: int) -> Optional[List[dict]]:
+        entry: Optional[Tuple[int, List[dict]]] = self.entries.get(vacancy_id)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(vacancy_id)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, vacancy_id: uuid.UUID, version: int, rows: List[dict]):
+        self.entries[vacancy_id] = (version, rows)
+        self.entries.move_to_end(vacancy_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+pipeline_cache = PipelineCache(PIPELINE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,90 @@
+# rate_limit.py
+import asyncio
+import os
+import time
+
+# OpenAI account limits. Each of serve.py's WEB_CONCURRENCY worker processes limits
+# itself to an equal share, which everything in the process that calls the LLM shares.
+_WORKER_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")) / _WORKER_PROCESSES
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "150000")) / _WORKER_PROCESSES
+
+# Rough prompt and completion sizes used to estimate a request's token cost
+PROMPT_OVERHEAD_TOKENS = 400
+COMPLETION_ESTIMATE_TOKENS = 600
+
+def estimate_tokens(text: str) -> int:
+    """Approximate tokens for one analysis request (~4 characters per token)."""
+    return len(text or "") // 4 + PROMPT_OVERHEAD_TOKENS + COMPLETION_ESTIMATE_TOKENS
+
+
+class TokenBucket:
+    """Refills continuously at `rate_per_minute`, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.available = rate_per_minute
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate_per_second
+
+    def take(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together, in FIFO order."""
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.lock = None  # created on first use, on the running event loop
+
+    async def acquire(self, tokens: int):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: grows by one after a run of successes, halves on rate limiting."""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64, increase_after: int = 10):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_after = increase_after
+        self.successes = 0
+
+    def on_success(self):
+        self.successes += 1
+        if self.successes >= self.increase_after:
+            self.successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+
+    def on_rate_limited(self):
+        self.successes = 0
+        self.limit = max(self.minimum, self.limit // 2)
+
+
+# Shared by the analysis worker and batch re-analysis in this process
+llm_rate_limiter = RateLimiter()
@@ -1,9 +1,14 @@
 # routers/candidates.py
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import crud, schemas
-from database import get_db
+import crud, schemas, bulk_import, streaming
+from candidate_dedup import DEDUP_POLICY
+from cpu_pool import cpu_pool
+from database import get_db, async_session_local
 
 router = APIRouter(
     prefix="/candidates",
@@ -15,21 +20,84 @@ async def search_for_candidates(
     role: Optional[str] = None,
     skills: Optional[str] = None, # Comma-separated string
     experience_years: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1), # Page size (default 50, at most 500) unless streaming
+    cursor: Optional[uuid.UUID] = None, # X-Next-Cursor of the previous page
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"), # Stream every match instead of one page
     db: AsyncSession = Depends(get_db)
 ):
-    skill_list = skills.split(',') if skills else []
-    candidates = await crud.search_candidates(db, role, skill_list, experience_years)
+    skill_list = [skill.strip() for skill in skills.split(',') if skill.strip()] if skills else []
+
+    if stream:
+        async def batches():
+            # The request-scoped session may be closed before the body is sent
+            async with async_session_local() as stream_db:
+                async for batch in crud.stream_candidates(stream_db, role, skill_list, experience_years, limit=limit, cursor=cursor):
+                    yield batch
+        return streaming.stream_rows(batches(), stream)
+
+    page_size = min(limit or 50, 500)
+    candidates = await crud.search_candidates(db, role, skill_list, experience_years, limit=page_size, cursor=cursor)
     if not candidates:
         raise HTTPException(status_code=404, detail="No candidates found matching the criteria.")
-    return candidates
+    headers = {"X-Next-Cursor": str(candidates[-1]["id"])} if len(candidates) == page_size else None
+    return streaming.RowsResponse(candidates, headers=headers)
+
+@router.patch("/{candidate_id}/status")
+async def update_candidate_status(
+    candidate_id: uuid.UUID,
+    request: schemas.CandidateStatusUpdateRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    if not await crud.update_candidate_status(db, candidate_id, request.status):
+        raise HTTPException(status_code=404, detail=f"Candidate with ID {candidate_id} not found.")
+    return {"message": "Candidate status updated.", "candidate_id": candidate_id, "status": request.status}
 
 @router.post("/import", status_code=201)
 async def import_candidate(
     request: schemas.CandidateImportRequest,
+    on_duplicate: str = Query(DEDUP_POLICY, pattern="^(merge|skip|insert)$"),
     db: AsyncSession = Depends(get_db)
 ):
+    """Imports one candidate. A duplicate of a stored candidate (same resume URL, same
+    content or a near-identical resume) is merged into it or skipped per `on_duplicate`.
+    """
     try:
-        await crud.create_candidate(db, request.fullContent)
-        return {"message": "Candidate(s) imported successfully.", "imported_count": 1}
+        counts, candidate_id = await crud.create_candidate(db, request.fullContent, on_duplicate)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error on import: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database error on import: {e}")
+    if counts["inserted"]:
+        message = "Candidate(s) imported successfully."
+    elif counts["merged"]:
+        message = "Duplicate of an existing candidate; merged into it."
+    else:
+        message = "Duplicate of an existing candidate; skipped."
+    return {"message": message, "imported_count": counts["inserted"], "candidate_id": candidate_id, **counts}
+
+@router.post("/import/bulk", status_code=200)
+async def import_candidates_bulk(
+    request: Request,
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=1, le=bulk_import.MAX_CHUNK_SIZE),
+    on_duplicate: str = Query(DEDUP_POLICY, pattern="^(merge|skip|insert)$"),
+):
+    """Imports a JSON array or NDJSON stream of candidates in batched chunks.
+
+    Each element may be the bare import content or a {"fullContent": ...} envelope.
+    Duplicates are merged into the stored candidate or skipped per `on_duplicate`.
+    The response is NDJSON: one progress line per chunk, then a summary line.
+    """
+    async def prepare(values):
+        # Validation and row building are CPU-bound; they run in a child process
+        return await cpu_pool.run(crud.prepare_candidate_rows, values)
+
+    async def progress_lines():
+        # The request-scoped session may be closed before a streamed body finishes,
+        # so the import uses its own session.
+        async with async_session_local() as db:
+            async def write_chunk(rows):
+                return await crud.bulk_create_candidates(db, rows, on_duplicate)
+
+            records = bulk_import.iter_json_records(request.stream())
+            async for progress in bulk_import.run_chunked_import(records, prepare, write_chunk, chunk_size):
+                yield json.dumps(progress) + "\n"
+
+    return StreamingResponse(progress_lines(), media_type="application/x-ndjson")
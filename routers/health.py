@@ -0,0 +1,51 @@
+# routers/health.py
+from fastapi import APIRouter, Response
+from cpu_pool import cpu_pool
+from database import ping, pool_metrics, pool_warmup
+from llm_cache import llm_cache
+from llm_providers import llm
+from pipeline_cache import pipeline_cache
+
+router = APIRouter(
+    prefix="/health",
+    tags=["Health"]
+)
+
+@router.get("/ready")
+async def get_readiness(response: Response):
+    """Readiness probe: 200 once the connection pool is warm and the database answers, 503 before.
+
+    The database is probed outside the pool: a worker whose pool is busy is
+    still ready, and failing it would only move its load onto the others.
+    """
+    status = pool_warmup.snapshot()
+    if pool_warmup.ready:
+        try:
+            await ping()
+        except Exception as e:
+            status.update(ready=False, error=str(e))
+    if not status["ready"]:
+        response.status_code = 503
+    status["pool"] = pool_metrics.snapshot()
+    return status
+
+@router.get("/db-pool")
+async def get_db_pool_metrics():
+    return pool_metrics.snapshot()
+
+@router.get("/cpu-pool")
+async def get_cpu_pool_metrics():
+    return cpu_pool.snapshot()
+
+@router.get("/llm-cache")
+async def get_llm_cache_metrics():
+    return llm_cache.snapshot()
+
+@router.get("/llm")
+async def get_llm_metrics():
+    return llm.stats.snapshot()
+
+
+@router.get("/pipeline-cache")
+async def get_pipeline_cache_metrics():
+    return pipeline_cache.snapshot()
@@ -1,51 +1,114 @@
 # routers/interviews.py
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-import crud, schemas, llm_service
-from database import get_db
+import crud, schemas
+from analysis_worker import stream_analysis, worker as analysis_worker
+from database import async_session_local, get_db
+from streaming import SSE_HEADERS, SSE_KEEPALIVE, sse_event
 import uuid
+from typing import List, Optional
 
 router = APIRouter(
     prefix="/interviews",
     tags=["Interviews"]
 )
 
-@router.post("/schedule", response_model=schemas.InterviewScheduleResponse)
+@router.post("/schedule", response_model=schemas.InterviewScheduleResponse, status_code=202)
 async def schedule_new_interview(
     request: schemas.InterviewScheduleRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    # Check if candidate and vacancy exist
-    candidate = await crud.get_candidate_by_id(db, request.candidate_id)
-    if not candidate:
-        raise HTTPException(status_code=404, detail=f"Candidate with ID {request.candidate_id} not found.")
-    
-    vacancy = await crud.get_vacancy_by_id(db, request.vacancy_id)
-    if not vacancy:
-        raise HTTPException(status_code=404, detail=f"Vacancy with ID {request.vacancy_id} not found.")
-
     try:
-        # Trigger LLM analysis
-        analysis_result = await llm_service.analyze_interview_text(request.interview_text)
-        
-        # Schedule interview and update candidate status in one transaction
-        interview = await crud.schedule_interview(db, request, analysis_result)
-        
-        return {
-            "message": "Interview scheduled and analysis completed.",
-            "interview_id": interview.id,
-            "candidate_id": interview.candidate_id
-        }
+        # Existence checks, the interview insert and the candidate status update run
+        # as one statement; the LLM analysis runs afterwards in the analysis worker
+        interview = await crud.schedule_interview(db, request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to schedule interview: {e}")
 
+    if interview is None:
+        # Nothing was written; find out which one is missing
+        if not await crud.get_candidate_by_id(db, request.candidate_id):
+            raise HTTPException(status_code=404, detail=f"Candidate with ID {request.candidate_id} not found.")
+        raise HTTPException(status_code=404, detail=f"Vacancy with ID {request.vacancy_id} not found.")
+
+    analysis_worker.notify()
+    return {
+        "message": "Interview scheduled; analysis queued.",
+        "interview_id": interview.id,
+        "candidate_id": interview.candidate_id,
+        "analysis_status": interview.analysis_status
+    }
+
+
+@router.post("/batch-analysis", response_model=schemas.BatchAnalysisResponse, status_code=202)
+async def queue_batch_analysis(
+    request: schemas.BatchAnalysisRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Re-queues interviews (by ID or by vacancy) for analysis by the rate-limited worker."""
+    if not request.interview_ids and not request.vacancy_id:
+        raise HTTPException(status_code=400, detail="Provide interview_ids or vacancy_id.")
+    queued_count = await crud.requeue_analyses(db, request.interview_ids, request.vacancy_id)
+    analysis_worker.notify()
+    return {"message": "Interviews queued for analysis.", "queued_count": queued_count}
+
+
+@router.get("/search", response_model=List[schemas.InterviewSearchResult])
+async def search_interviews(
+    response: Response,
+    q: Optional[str] = Query(None, max_length=500), # e.g. reliability -oncall, "system design"
+    field: str = Query("all", pattern="^(all|red_flags|strengths|weaknesses|transcript)$"),
+    min_score: Optional[int] = Query(None, ge=0, le=100),
+    max_score: Optional[int] = Query(None, ge=0, le=100),
+    has_red_flags: Optional[bool] = None,
+    vacancy_id: Optional[uuid.UUID] = None,
+    candidate_id: Optional[uuid.UUID] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ranked search over interview transcripts and analyses, e.g.
+    `?q=reliability&field=red_flags&max_score=49`.
+    """
+    q = q.strip() if q else None
+    results = await crud.search_interviews(
+        db, q, field, min_score, max_score, has_red_flags, vacancy_id, candidate_id, limit, offset,
+    )
+    if len(results) == limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return results
+
 
 @router.get("/{interview_id}/analysis", response_model=schemas.InterviewAnalysisResponse)
 async def get_interview_analysis(interview_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
     interview = await crud.get_interview_by_id(db, interview_id)
     if not interview:
         raise HTTPException(status_code=404, detail="Interview not found.")
-    if not interview.interview_analysis:
-        raise HTTPException(status_code=404, detail="Analysis not found for this interview.")
-        
-    return interview
\ No newline at end of file
+
+    # interview_analysis stays empty until analysis_status is "done"
+    return interview
+
+
+@router.get("/{interview_id}/analysis/stream")
+async def stream_interview_analysis(
+    interview_id: uuid.UUID,
+    refresh: bool = False,
+):
+    """Runs the interview's analysis now and streams it as Server-Sent Events.
+
+    Strengths, weaknesses, red flags ("item"), assessment ratings ("aspect") and
+    whole fields ("field") are sent as they are generated; "done" carries the
+    analysis once it is stored, "error" a failure. A finished analysis is replayed
+    unless `refresh=true`. The analysis is stored even if the client disconnects.
+    """
+    # A short session of its own: a get_db session would stay open until the stream ends
+    async with async_session_local() as db:
+        if not await crud.get_interview_by_id(db, interview_id):
+            raise HTTPException(status_code=404, detail="Interview not found.")
+
+    async def events():
+        async for event, data in stream_analysis(interview_id, refresh):
+            yield SSE_KEEPALIVE if event == "keepalive" else sse_event(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
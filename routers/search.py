@@ -1,12 +1,20 @@
 # routers/search.py
-from fastapi import APIRouter, HTTPException
-import schemas, llm_service
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import crud, embeddings, schemas, llm_service, streaming
+from database import get_db, async_session_local
+from semantic_index import semantic_index
 
 router = APIRouter(
     prefix="/search",
     tags=["Search"]
 )
 
+# Semantic search fetches 4x more neighbours per round while too many of them are filtered out
+SEMANTIC_SEARCH_ROUNDS = 3
+
 @router.post("/parse-description", response_model=schemas.SearchDescriptionParseResponse)
 async def parse_candidate_description(request: schemas.SearchDescriptionParseRequest):
     if not request.description:
@@ -15,4 +23,72 @@ async def parse_candidate_description(request: schemas.SearchDescriptionParseReq
         parsed_result = await llm_service.parse_search_query(request.description)
         return parsed_result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to process description with LLM: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to process description with LLM: {e}")
+
+@router.post("/candidates", response_model=schemas.CandidateQueryResponse)
+async def search_candidates_by_description(
+    request: schemas.CandidateQueryRequest,
+    stream: Optional[str] = Query(None, pattern="^ndjson$"), # Stream the filters, then the candidates
+):
+    """Parses a natural-language description with the LLM and runs the candidate search in one call.
+
+    Concurrent requests with the same description share one LLM call. With
+    ?stream=ndjson the response is NDJSON: a {"type": "filters"} line as soon as
+    the description is parsed, {"type": "candidates"} lines as rows are read,
+    then a {"type": "done"} line with the count.
+    """
+    if not request.description.strip():
+        raise HTTPException(status_code=400, detail="Description cannot be empty.")
+    try:
+        filters = await llm_service.parse_search_query(request.description)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process description with LLM: {e}")
+    skills = [skill.strip() for skill in filters.skills or [] if skill and skill.strip()]
+
+    if stream:
+        async def lines():
+            yield streaming.dumps({"type": "filters", **filters.model_dump()}) + b"\n"
+            count = 0
+            # The request-scoped session may be closed before the body is sent
+            async with async_session_local() as stream_db:
+                async for batch in crud.stream_candidates(stream_db, filters.role, skills, filters.experience_years, limit=request.limit):
+                    count += len(batch)
+                    yield streaming.dumps({"type": "candidates", "items": batch}) + b"\n"
+            yield streaming.dumps({"type": "done", "count": count}) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    # Opened only after the parse, so no pooled connection is held during the LLM call
+    async with async_session_local() as db:
+        candidates = await crud.search_candidates(db, filters.role, skills, filters.experience_years, limit=request.limit)
+    next_cursor = candidates[-1]["id"] if len(candidates) == request.limit else None
+    return {"filters": filters, "candidates": candidates, "next_cursor": next_cursor}
+
+
+@router.post("/semantic", response_model=List[schemas.CandidateSemanticMatch])
+async def semantic_candidate_search(request: schemas.SemanticSearchRequest, db: AsyncSession = Depends(get_db)):
+    """Candidates closest in meaning to a role / skills query, e.g. the output of /search/parse-description."""
+    text = embeddings.query_text(request.role, request.skills, request.text)
+    if not text:
+        raise HTTPException(status_code=400, detail="Provide a role, skills or text to search for.")
+    await semantic_index.refresh(db)
+    query_vector = (await embeddings.embed_texts([text]))[0]
+    # Over-fetch when the experience filter will drop some of the neighbours
+    fetch = request.top_k * 4 if request.experience_years else request.top_k
+    candidates = {}
+    for _ in range(SEMANTIC_SEARCH_ROUNDS):
+        neighbours = semantic_index.search(query_vector, fetch)
+        # Deeper rounds only look up the new neighbours
+        new_ids = [candidate_id for candidate_id, _ in neighbours if candidate_id not in candidates]
+        if new_ids:
+            found = await crud.get_candidates_by_ids(db, new_ids, request.experience_years)
+            candidates.update((candidate_id, found.get(candidate_id)) for candidate_id in new_ids)
+        kept = sum(1 for candidate_id, _ in neighbours if candidates[candidate_id] is not None)
+        # Neighbours can also be candidates deleted since the index build (e.g. merged duplicates)
+        if kept >= request.top_k or len(neighbours) < fetch:
+            break
+        fetch *= 4
+    matches = []
+    for candidate_id, similarity in neighbours:
+        if candidates[candidate_id] is not None:
+            matches.append({**candidates[candidate_id], "similarity": round(similarity, 4)})
+    return matches[:request.top_k]
@@ -1,9 +1,12 @@
 # routers/vacancies.py
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-import crud, schemas
-from database import get_db
+from typing import List, Optional
+import crud, schemas, bulk_import, matching, pipeline_cache, streaming, vacancy_stats
+from cpu_pool import cpu_pool
+from database import get_db, async_session_local
 import uuid
 
 router = APIRouter(
@@ -12,29 +15,71 @@ router = APIRouter(
 )
 
 @router.get("", response_model=List[schemas.VacancyListResponse])
-async def get_all_vacancies(db: AsyncSession = Depends(get_db)):
+async def get_all_vacancies(
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"), # Stream rows as they are read
+    db: AsyncSession = Depends(get_db)
+):
+    if stream:
+        async def batches():
+            # The request-scoped session may be closed before the body is sent
+            async with async_session_local() as stream_db:
+                async for batch in crud.stream_vacancies(stream_db):
+                    yield batch
+        return streaming.stream_rows(batches(), stream)
+
     vacancies = await crud.get_all_vacancies(db)
     if not vacancies:
         raise HTTPException(status_code=404, detail="No vacancies found.")
-    return vacancies
+    return streaming.RowsResponse(vacancies)
 
 @router.get("/{vacancy_id}/candidates", response_model=List[schemas.VacancyCandidateResponse])
-async def get_vacancy_candidates(vacancy_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
-    results = await crud.get_candidates_for_vacancy(db, vacancy_id)
+async def get_vacancy_candidates(
+    vacancy_id: uuid.UUID,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """The vacancy's candidate pipeline, served from a cache tagged with the vacancy's pipeline_version.
+
+    The ETag changes whenever the pipeline does, so pollers sending If-None-Match
+    get a bodiless 304 while nothing has changed.
+    """
+    version = await crud.get_pipeline_version(db, vacancy_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="No candidates found for this vacancy.")
+    tag = pipeline_cache.etag(vacancy_id, version)
+    if pipeline_cache.etag_matches(if_none_match, tag):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": "no-cache"})
+
+    results = pipeline_cache.pipeline_cache.get(vacancy_id, version)
+    if results is None:
+        results = await crud.get_candidates_for_vacancy(db, vacancy_id)
+        pipeline_cache.pipeline_cache.set(vacancy_id, version, results)
     if not results:
         raise HTTPException(status_code=404, detail="No candidates found for this vacancy.")
-    
-    response_data = []
-    for candidate, interview_id in results:
-        response_data.append(
-            schemas.VacancyCandidateResponse(
-                id=candidate.id,
-                name=candidate.name,
-                status=candidate.status,
-                interview_id=interview_id
-            )
-        )
-    return response_data
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = "no-cache"
+    return results
+
+
+@router.get("/{vacancy_id}/matches", response_model=List[schemas.CandidateMatchResponse])
+async def get_vacancy_matches(
+    vacancy_id: uuid.UUID,
+    limit: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    vacancy = await crud.get_vacancy_by_id(db, vacancy_id)
+    if not vacancy:
+        raise HTTPException(status_code=404, detail=f"Vacancy with ID {vacancy_id} not found.")
+    return await matching.match_candidates(db, vacancy, limit)
+
+
+@router.get("/{vacancy_id}/stats", response_model=schemas.VacancyStatsResponse)
+async def get_vacancy_stats(vacancy_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    """Funnel counts, score distribution and average aspect ratings of the vacancy's interviews."""
+    if await crud.get_pipeline_version(db, vacancy_id) is None:
+        raise HTTPException(status_code=404, detail=f"Vacancy with ID {vacancy_id} not found.")
+    return await vacancy_stats.get_stats(db, vacancy_id)
 
 
 @router.post("/import", status_code=201)
@@ -46,4 +91,29 @@ async def import_vacancy(
         await crud.create_vacancy(db, request.fullContent)
         return {"message": "Vacancy(-ies) imported successfully.", "imported_count": 1}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error on import: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database error on import: {e}")
+
+@router.post("/import/bulk", status_code=200)
+async def import_vacancies_bulk(
+    request: Request,
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=1, le=bulk_import.MAX_CHUNK_SIZE),
+):
+    """Upserts a JSON array or NDJSON stream of vacancies on their job-board ID.
+
+    Unchanged vacancies (same content hash) are skipped. The response is NDJSON:
+    one progress line per committed chunk, then a summary line.
+    """
+    async def prepare(values):
+        # Validation and row building are CPU-bound; they run in a child process
+        return await cpu_pool.run(crud.prepare_vacancy_rows, values)
+
+    async def progress_lines():
+        async with async_session_local() as db:
+            async def write_chunk(rows):
+                return await crud.bulk_upsert_vacancies(db, rows)
+
+            records = bulk_import.iter_json_records(request.stream())
+            async for progress in bulk_import.run_chunked_import(records, prepare, write_chunk, chunk_size):
+                yield json.dumps(progress) + "\n"
+
+    return StreamingResponse(progress_lines(), media_type="application/x-ndjson")
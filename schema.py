@@ -0,0 +1,104 @@
+# schema.py
+"""Creates and upgrades the database schema.
+
+Run it once per deploy, before the API starts (a release step or an init
+container), never from the API workers themselves:
+
+    python -m schema --upgrade [--backfill]
+
+The upgrade is additive and idempotent. It creates the models' missing tables,
+then their missing columns and indexes, then runs the data fixes for those
+columns, all in one transaction. Concurrent runs wait for each other on an
+advisory lock. --backfill then runs the slower jobs that fill columns added to
+existing rows: skill IDs, embeddings, duplicate fingerprints and vacancy stats.
+"""
+import argparse
+import asyncio
+import logging
+from typing import List
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+import models  # Registers the tables on Base.metadata
+from database import Base, dispose_engine, get_engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key of the advisory lock that serializes upgrades
+_LOCK_KEY = 0x736368656d61
+
+# Fixes for rows that predate a column; each must be idempotent
+DATA_FIXES = [
+    # Interviews analyzed before the analysis queue existed
+    "UPDATE interviews SET analysis_status = 'done' "
+    "WHERE analysis_status IS NULL AND interview_analysis IS NOT NULL",
+    # Never analyzed: re-queue them with POST /interviews/batch-analysis if wanted
+    "UPDATE interviews SET analysis_status = 'failed', analysis_error = 'Not analyzed before the analysis queue existed.' "
+    "WHERE analysis_status IS NULL",
+    "UPDATE interviews SET analysis_attempts = 0 WHERE analysis_attempts IS NULL",
+]
+
+
+def _add_missing(sync_connection) -> List[str]:
+    """Adds the missing columns and indexes of existing tables; returns what was created."""
+    inspector = inspect(sync_connection)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=sync_connection.dialect)
+                sync_connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {ddl}"))
+                created.append(f"column {table.name}.{column.name}")
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(sync_connection, checkfirst=True)
+                created.append(f"index {index.name}")
+    return created
+
+async def upgrade() -> List[str]:
+    """Brings the schema up to date with the models; returns the changes made."""
+    async with get_engine().begin() as conn:
+        await conn.execute(select(func.pg_advisory_xact_lock(_LOCK_KEY)))
+        tables = set(await conn.run_sync(lambda sync_connection: inspect(sync_connection).get_table_names()))
+        # Creates missing tables with their indexes (and the pg_trgm extension, see models)
+        await conn.run_sync(Base.metadata.create_all)
+        changes = [f"table {name}" for name in Base.metadata.tables if name not in tables]
+        changes += await conn.run_sync(_add_missing)
+        for statement in DATA_FIXES:
+            result = await conn.execute(text(statement))
+            if result.rowcount:
+                changes.append(f"{result.rowcount} rows: {statement.split(' WHERE')[0]}")
+    return changes
+
+async def backfill():
+    """Fills columns added to existing rows; each job is safe to re-run."""
+    import candidate_dedup, semantic_index, skill_vocabulary, vacancy_stats
+
+    logger.info("Backfilling skill IDs...")
+    await skill_vocabulary.reindex()
+    logger.info("Backfilling embeddings...")
+    await semantic_index.reembed(stale_only=True)
+    logger.info("Backfilling duplicate fingerprints...")
+    await candidate_dedup.backfill()
+    logger.info("Backfilling vacancy stats...")
+    await vacancy_stats.rebuild()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Database schema management.")
+    parser.add_argument("--upgrade", action="store_true", help="Create missing tables, columns and indexes.")
+    parser.add_argument("--backfill", action="store_true", help="Fill columns added to existing rows.")
+    args = parser.parse_args()
+    if not (args.upgrade or args.backfill):
+        parser.print_help()
+    else:
+        async def main():
+            if args.upgrade:
+                changes = await upgrade()
+                print("\n".join(changes) if changes else "Schema is up to date.")
+            if args.backfill:
+                await backfill()
+            await dispose_engine()
+        asyncio.run(main())
@@ -1,7 +1,7 @@
 # schemas.py
 import uuid
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Dict, Union
 from datetime import datetime, date
 
 class Config:
@@ -35,6 +35,26 @@ class CandidateSearchResponse(BaseModel):
     class Config(Config):
         pass
 
+class CandidateQueryRequest(BaseModel):
+    description: str
+    limit: int = Field(50, ge=1, le=500)
+
+class CandidateQueryResponse(BaseModel):
+    filters: SearchDescriptionParseResponse
+    candidates: List[CandidateSearchResponse]
+    next_cursor: Optional[uuid.UUID] = None  # Pass as `cursor` to /candidates/search for the next page
+
+class SemanticSearchRequest(BaseModel):
+    # The fields of SearchDescriptionParseResponse, so a parse result can be posted as is
+    role: Optional[str] = None
+    skills: Optional[List[str]] = None
+    experience_years: Optional[str] = None
+    text: Optional[str] = None  # Free text added to the query
+    top_k: int = Field(20, ge=1, le=200)
+
+class CandidateSemanticMatch(CandidateSearchResponse):
+    similarity: float
+
 class CandidateImportContent(BaseModel):
     title: str
     skills_atomic: Optional[List[str]] = Field(None, alias="skills_atomic")
@@ -56,6 +76,9 @@ class VacancyListResponse(BaseModel):
     class Config(Config):
         pass
 
+class CandidateStatusUpdateRequest(BaseModel):
+    status: str = Field(..., min_length=1, max_length=50)
+
 class VacancyCandidateResponse(BaseModel):
     id: uuid.UUID
     name: str
@@ -65,7 +88,38 @@ class VacancyCandidateResponse(BaseModel):
     class Config(Config):
         pass
 
+class VacancyFunnel(BaseModel):
+    scheduled: int = 0
+    analyzed: int = 0
+    red_flagged: int = 0
+
+class VacancyScoreStats(BaseModel):
+    count: int = 0
+    average: Optional[float] = None
+    histogram: Dict[str, int] = {}  # "0-9" ... "90-100" -> interviews
+
+class VacancyAspectStats(BaseModel):
+    average: Optional[float] = None  # Needs Improvement = 1, Good = 2, Excellent = 3
+    ratings: Dict[str, int] = {}
+
+class VacancyStatsResponse(BaseModel):
+    vacancy_id: uuid.UUID
+    funnel: VacancyFunnel
+    score: VacancyScoreStats
+    aspects: Dict[str, VacancyAspectStats] = {}
+
+class CandidateMatchResponse(BaseModel):
+    id: uuid.UUID
+    name: str
+    status: str
+    main_url: Optional[str] = None
+    total_experience_months: Optional[int] = None
+    score: float
+    matched_skills: List[str] = []
+
 class VacancyImportContent(BaseModel):
+    id: Optional[Union[str, int]] = None  # Job-board vacancy ID
+    alternate_url: Optional[str] = None
     title: str
     published_at: Optional[datetime] = None
     responsibilities: Optional[List[str]] = None
@@ -88,10 +142,34 @@ class InterviewScheduleResponse(BaseModel):
     message: str
     interview_id: uuid.UUID
     candidate_id: uuid.UUID
+    analysis_status: str
+
+class BatchAnalysisRequest(BaseModel):
+    interview_ids: Optional[List[uuid.UUID]] = None
+    vacancy_id: Optional[uuid.UUID] = None
+
+class BatchAnalysisResponse(BaseModel):
+    message: str
+    queued_count: int
+
+class InterviewSearchResult(BaseModel):
+    id: uuid.UUID
+    candidate_id: uuid.UUID
+    vacancy_id: uuid.UUID
+    interview_name: Optional[str] = None
+    interview_date: Optional[datetime] = None
+    analysis_status: Optional[str] = None
+    overall_score: Optional[int] = None
+    rank: Optional[float] = None
+    headline: Optional[str] = None  # Transcript fragments with the matches in <b>...</b>
 
 class InterviewAnalysisResponse(BaseModel):
     interview_text: str
-    interview_analysis: InterviewAnalysis
+    # None for interviews from before the analysis queue
+    analysis_status: Optional[str] = None
+    analysis_attempts: Optional[int] = 0
+    analysis_error: Optional[str] = None
+    interview_analysis: Optional[InterviewAnalysis] = None
 
     class Config(Config):
         pass
\ No newline at end of file
@@ -0,0 +1,343 @@
+# semantic_index.py
+"""Approximate nearest-neighbour search over candidate embeddings.
+
+Candidate.embedding (float32 bytes, written at import time) is the source of
+truth. A build writes an IVF index to EMBEDDING_INDEX_DIR:
+
+    python -m semantic_index --build          # after a bulk import, then e.g. nightly
+    python -m semantic_index --reembed        # after changing the embedder
+
+- vectors.npy: all vectors as one float32 matrix, grouped by cluster and
+  memory-mapped read-only, so API worker processes share it through the page cache;
+- centroids.npy / offsets.npy: k-means centroids and each cluster's row range;
+- ids.npy / meta.json: candidate IDs per row and build metadata.
+
+A query scores the centroids, scans the EMBEDDING_NPROBE closest clusters and
+keeps the top K. Candidates imported or updated after the build are picked up
+from the database every EMBEDDING_REFRESH_SECONDS and searched exhaustively
+until the next build.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import embeddings, models
+from database import async_session_local
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", "data/semantic_index")
+EMBEDDING_NPROBE = int(os.getenv("EMBEDDING_NPROBE", "8"))
+EMBEDDING_REFRESH_SECONDS = float(os.getenv("EMBEDDING_REFRESH_SECONDS", "30"))
+# updated_at is the writing transaction's start time, so a long import can commit rows
+# stamped before the last refresh; each refresh looks back this far to catch them
+REFRESH_LOOKBACK = timedelta(minutes=10)
+# k-means runs on a sample of at most this many vectors
+KMEANS_SAMPLE_SIZE = 100_000
+KMEANS_ITERATIONS = 15
+# Most candidates written since the build that a worker keeps in memory and scans
+# exhaustively. Past it the oldest are dropped from search until the next --build,
+# so build at least that often (or right away when there is no build yet).
+EMBEDDING_MAX_TAIL = int(os.getenv("EMBEDDING_MAX_TAIL", "50000"))
+_CHUNK_ROWS = 16384
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest (highest dot product) centroid of every vector, in chunks."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + _CHUNK_ROWS])
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def kmeans(sample: np.ndarray, n_lists: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means: centroids are kept at unit length, like the vectors."""
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_lists)
+        empty = counts == 0
+        # Re-seed empty clusters with random vectors
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1, norms)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"))
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+
+    def search(self, query: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (row indices, scores) of the best k rows in the nprobe closest clusters."""
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+        if len(rows) == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+        # Clusters are contiguous slices, so each probe is a sequential read of the memmap
+        scores = np.concatenate([np.asarray(self.vectors[self.offsets[i]:self.offsets[i + 1]]) @ query for i in lists])
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        return rows, scores
+
+
+async def build(directory: str = EMBEDDING_INDEX_DIR, n_lists: Optional[int] = None, seed: int = 0) -> Optional[str]:
+    """Builds a new index from the stored embeddings of the current embedder and makes it current."""
+    embedder = embeddings.get_embedder()
+    candidate = models.Candidate
+    current_model = candidate.embedding_model == embedder.name
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"build-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}")
+    os.makedirs(path)
+
+    async with async_session_local() as db:
+        # Rows written after this moment are served from the refresh tail
+        built_at = (await db.execute(select(func.localtimestamp()))).scalar()
+        count = (await db.execute(select(func.count()).where(current_model))).scalar()
+        if not count:
+            logger.warning("No candidate embeddings for %s; nothing to index", embedder.name)
+            shutil.rmtree(path)
+            return None
+        raw_path = os.path.join(path, "raw.npy")
+        raw = np.lib.format.open_memmap(raw_path, mode="w+", dtype=np.float32, shape=(count, embedder.dim))
+        ids = np.empty((count, 16), dtype=np.uint8)
+        n = 0
+        result = await db.stream(
+            select(candidate.id, candidate.embedding).where(current_model).execution_options(yield_per=_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            for row in rows[:count - n]:
+                raw[n] = embeddings.from_bytes(row.embedding)
+                ids[n] = np.frombuffer(row.id.bytes, dtype=np.uint8)
+                n += 1
+
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    n_lists = min(n_lists, n)
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(raw[np.sort(rng.choice(n, min(n, KMEANS_SAMPLE_SIZE), replace=False))])
+    centroids = kmeans(sample, n_lists, KMEANS_ITERATIONS, rng)
+    assignments = _assign(raw[:n], centroids)
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+
+    vectors = np.lib.format.open_memmap(os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(n, embedder.dim))
+    for start in range(0, n, _CHUNK_ROWS):
+        vectors[start:start + _CHUNK_ROWS] = raw[order[start:start + _CHUNK_ROWS]]
+    vectors.flush()
+    del vectors, raw
+    os.remove(raw_path)
+    np.save(os.path.join(path, "ids.npy"), ids[:n][order])
+    np.save(os.path.join(path, "centroids.npy"), centroids)
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"model": embedder.name, "dim": embedder.dim, "count": n, "lists": n_lists,
+                   "built_at": built_at.isoformat()}, f)
+
+    # Switch atomically; readers still mapping an old build keep working (unlinked files stay readable)
+    pointer = os.path.join(directory, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(os.path.basename(path))
+    os.replace(pointer + ".tmp", pointer)
+    for name in os.listdir(directory):
+        if name.startswith("build-") and name != os.path.basename(path):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    logger.info("Built semantic index of %d candidates in %d lists at %s", n, n_lists, path)
+    return path
+
+
+class SemanticIndex:
+    """The current IVF build plus the candidates written since, for this process."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index: Optional[IVFIndex] = None
+        self.build_name: Optional[str] = None
+        self.since: Optional[datetime] = None
+        self.refreshed_at = float("-inf")
+        # Candidate ID -> its row of _tail_vectors, insertion-ordered by write time, oldest first
+        self.tail: Dict[bytes, int] = {}
+        self.tail_truncated = False
+        self._reset_tail_rows()
+        self._lock = asyncio.Lock()
+
+    def _reset_tail_rows(self):
+        self._tail_ids: List[Optional[bytes]] = []  # Per row; None for a free row
+        self._free_rows: List[int] = []
+        # Grown by doubling; rows past len(_tail_ids) are spare capacity
+        self._tail_vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def _add_to_tail(self, keys: List[bytes], vectors: np.ndarray):
+        """Overwrites the rows of candidates already in the tail and adds the others as the newest."""
+        rows = np.empty(len(keys), dtype=np.intp)
+        for i, key in enumerate(keys):
+            row = self.tail.pop(key, None)
+            if row is None and self._free_rows:
+                row = self._free_rows.pop()
+                self._tail_ids[row] = key
+            elif row is None:
+                row = len(self._tail_ids)
+                self._tail_ids.append(key)
+            self.tail[key] = rows[i] = row
+        if len(self._tail_ids) > len(self._tail_vectors):
+            grown = np.empty((max(1024, 2 * len(self._tail_ids)), vectors.shape[1]), dtype=np.float32)
+            if len(self._tail_vectors):
+                grown[:len(self._tail_vectors)] = self._tail_vectors
+            self._tail_vectors = grown
+        self._tail_vectors[rows] = vectors
+
+    def _evict_oldest(self, count: int):
+        for key in list(itertools.islice(self.tail, count)):
+            row = self.tail.pop(key)
+            self._tail_ids[row] = None
+            self._free_rows.append(row)
+
+    def _load_current(self, model: str):
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as f:
+                name = f.read().strip()
+        except OSError:
+            name = None
+        if name == self.build_name:
+            return
+        index = IVFIndex(os.path.join(self.directory, name)) if name else None
+        if index is not None and index.meta["model"] != model:
+            logger.warning("Semantic index was built for %s, not %s; ignoring it", index.meta["model"], model)
+            index = None
+        self.index, self.build_name = index, name
+        self.since = datetime.fromisoformat(index.meta["built_at"]) if index else None
+        self.tail = {}
+        self.tail_truncated = False
+        self._reset_tail_rows()
+
+    async def refresh(self, db: AsyncSession):
+        """Loads a newer build if there is one and fetches embeddings written since the build."""
+        if time.monotonic() - self.refreshed_at < EMBEDDING_REFRESH_SECONDS:
+            return
+        async with self._lock:
+            if time.monotonic() - self.refreshed_at < EMBEDDING_REFRESH_SECONDS:
+                return
+            embedder = embeddings.get_embedder()
+            self._load_current(embedder.name)
+            candidate = models.Candidate
+            # Newest first, so a capped read keeps the most recent candidates
+            query = (
+                select(candidate.id, candidate.embedding, candidate.updated_at)
+                .where(candidate.embedding_model == embedder.name)
+                .order_by(candidate.updated_at.desc().nullslast())
+                .limit(EMBEDDING_MAX_TAIL)
+            )
+            if self.since is not None:
+                query = query.where(candidate.updated_at > self.since - REFRESH_LOOKBACK)
+            fetched = []
+            result = await db.stream(query.execution_options(yield_per=_CHUNK_ROWS))
+            async for rows in result.partitions():
+                fetched.extend(rows)
+            fetched.reverse()
+            if fetched:
+                # Only the fetched rows are stacked, off the loop: a first read can be tens of thousands
+                vectors = await asyncio.to_thread(lambda: np.stack([embeddings.from_bytes(row.embedding) for row in fetched]))
+                self._add_to_tail([row.id.bytes for row in fetched], vectors)
+            for row in fetched:
+                if row.updated_at is not None and (self.since is None or row.updated_at > self.since):
+                    self.since = row.updated_at
+            overflow = len(self.tail) - EMBEDDING_MAX_TAIL
+            # A full read may have stopped short of older rows as well
+            if overflow > 0 or len(fetched) == EMBEDDING_MAX_TAIL:
+                self._evict_oldest(max(overflow, 0))
+                if not self.tail_truncated:
+                    logger.warning(
+                        "%d or more candidates written since the semantic index build; searching the newest %d only. "
+                        "Run `python -m semantic_index --build`.", EMBEDDING_MAX_TAIL, EMBEDDING_MAX_TAIL,
+                    )
+                self.tail_truncated = True
+            self.refreshed_at = time.monotonic()
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = EMBEDDING_NPROBE) -> List[Tuple[uuid.UUID, float]]:
+        """Top k (candidate ID, cosine similarity), best first."""
+        results = {}
+        if self.tail:
+            scores = self._tail_vectors[:len(self._tail_ids)] @ query
+            scores[self._free_rows] = -np.inf
+            best = np.argsort(-scores)[:k]
+            results.update((self._tail_ids[i], float(scores[i])) for i in best if self._tail_ids[i] is not None)
+        if self.index is not None:
+            # Tail entries supersede the build's copy of the same candidate
+            rows, scores = self.index.search(query, k + len(results), nprobe)
+            for row, score in zip(rows, scores):
+                key = self.index.ids[row].tobytes()
+                if key not in self.tail:
+                    results[key] = float(score)
+        ranked = sorted(results.items(), key=lambda item: -item[1])[:k]
+        return [(uuid.UUID(bytes=key), score) for key, score in ranked]
+
+
+semantic_index = SemanticIndex(EMBEDDING_INDEX_DIR)
+
+
+async def reembed(batch_size: int = 500, stale_only: bool = False):
+    """Recomputes every candidate's embedding with the current embedder, or with `stale_only`
+    only those without one from it."""
+    candidate = models.Candidate
+    table = candidate.__table__
+    embedder = embeddings.get_embedder()
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("candidate_id"))
+        .values(embedding=bindparam("embedding"), embedding_model=embedder.name)
+    )
+    query = select(candidate.id, candidate.name, candidate.summary, candidate.skills, candidate.experience)
+    if stale_only:
+        query = query.where(candidate.embedding_model.is_distinct_from(embedder.name))
+    total = 0
+    async with async_session_local() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            texts = [embeddings.candidate_text(row.name, row.summary, row.skills, row.experience) for row in rows]
+            vectors = await embeddings.embed_texts(texts)
+            params = [{"candidate_id": row.id, "embedding": embeddings.to_bytes(v)} for row, v in zip(rows, vectors)]
+            # A separate session: the streaming one holds its cursor open
+            async with async_session_local() as writer:
+                await writer.execute(stmt, params)
+                await writer.commit()
+            total += len(params)
+            logger.info("Re-embedded %d candidates", total)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Semantic candidate index maintenance.")
+    parser.add_argument("--reembed", action="store_true", help="Recompute all embeddings with the current embedder.")
+    parser.add_argument("--build", action="store_true", help="Build the ANN index from the stored embeddings.")
+    parser.add_argument("--lists", type=int, help="Number of IVF clusters (default: sqrt of the row count).")
+    parser.add_argument("--dir", default=EMBEDDING_INDEX_DIR)
+    args = parser.parse_args()
+
+    async def main():
+        if args.reembed:
+            await reembed()
+        if args.build:
+            await build(args.dir, args.lists)
+
+    if args.reembed or args.build:
+        asyncio.run(main())
+    else:
+        parser.print_help()
@@ -0,0 +1,48 @@
+# serve.py
+"""Production server: uvicorn with several worker processes, uvloop and httptools.
+
+    python -m schema --upgrade    # once per deploy, before the workers start
+    WEB_CONCURRENCY=4 python serve.py
+
+Each worker is a separate process with its own event loop, database pool
+(DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so size Postgres' max_connections
+for WEB_CONCURRENCY times that), CPU pool (cpu_pool) and caches. The CPU pool
+and the LLM rate limits (LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, see
+rate_limit) are split evenly between the workers.
+"""
+import os
+import uvicorn
+
+# Worker processes; one per core by default
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+
+# Both ship with uvicorn[standard]; set to "auto" to fall back to asyncio / h11 when missing
+UVICORN_LOOP = os.getenv("UVICORN_LOOP", "uvloop")
+UVICORN_HTTP = os.getenv("UVICORN_HTTP", "httptools")
+
+# Idle keep-alive seconds; keep above the load balancer's idle timeout to avoid 502s on reuse
+UVICORN_TIMEOUT_KEEP_ALIVE = int(os.getenv("UVICORN_TIMEOUT_KEEP_ALIVE", "75"))
+UVICORN_BACKLOG = int(os.getenv("UVICORN_BACKLOG", "2048"))
+UVICORN_ACCESS_LOG = os.getenv("UVICORN_ACCESS_LOG", "true").lower() in ("1", "true", "yes")
+# Proxies whose X-Forwarded-* headers are trusted
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+if __name__ == "__main__":
+    # Read by the workers, e.g. to split the cores between their CPU pools
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        loop=UVICORN_LOOP,
+        http=UVICORN_HTTP,
+        timeout_keep_alive=UVICORN_TIMEOUT_KEEP_ALIVE,
+        backlog=UVICORN_BACKLOG,
+        access_log=UVICORN_ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+    )
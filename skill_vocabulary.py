@@ -0,0 +1,160 @@
+# skill_vocabulary.py
+"""Canonical skill names and IDs.
+
+The vocabulary lives in a JSON file (SKILLS_VOCABULARY_PATH, skills.json by
+default) of entries like {"id": 1, "name": "Python", "aliases": ["python3"]}.
+IDs are stored in Candidate.skill_ids / Vacancy.requirement_skill_ids, so an ID
+must never be reused for a different skill. The file is re-read when its mtime
+changes; after editing it, run
+
+    python -m skill_vocabulary --reindex
+
+to recompute the stored skill names and IDs.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKILLS_VOCABULARY_PATH = os.getenv(
+    "SKILLS_VOCABULARY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "skills.json")
+)
+# How often (at most) the file's mtime is checked for changes
+SKILLS_RELOAD_SECONDS = float(os.getenv("SKILLS_RELOAD_SECONDS", "5"))
+
+# "Python 3.11", "Go 1.21", "Angular v16" -> the same skill without the version
+_VERSION_SUFFIX = re.compile(r"[\s\-]*v?\d+(\.\d+)*$")
+
+def fold(skill: str) -> str:
+    """Case-folds a skill name and collapses whitespace so 'Python ' and 'PYTHON' compare equal."""
+    return " ".join(skill.split()).casefold()
+
+
+class SkillVocabulary:
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._checked_at = float("-inf")
+        # (folded name or alias -> id, id -> canonical name); swapped as a whole on reload
+        self._tables: Tuple[Dict[str, int], Dict[int, str]] = ({}, {})
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Could not load skill vocabulary from %s: %s", self.path, e)
+            return
+        ids, names = {}, {}
+        for entry in entries:
+            skill_id = int(entry["id"])
+            names[skill_id] = entry["name"]
+            for term in [entry["name"], *entry.get("aliases", [])]:
+                key = fold(term)
+                if ids.setdefault(key, skill_id) != skill_id:
+                    logger.warning("Skill term %r maps to both %s and %s; keeping %s", term, ids[key], skill_id, ids[key])
+        self._tables = (ids, names)
+        self._mtime = mtime
+        logger.info("Loaded %d skills from %s", len(names), self.path)
+
+    def _current(self) -> Tuple[Dict[str, int], Dict[int, str]]:
+        now = time.monotonic()
+        if now - self._checked_at >= SKILLS_RELOAD_SECONDS:
+            self._checked_at = now
+            try:
+                changed = os.stat(self.path).st_mtime != self._mtime
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+        return self._tables
+
+    def lookup(self, skill: str) -> Optional[int]:
+        """Returns the canonical ID of a skill name or alias, or None if it is not in the vocabulary."""
+        ids, _ = self._current()
+        key = fold(skill)
+        if key in ids:
+            return ids[key]
+        return ids.get(_VERSION_SUFFIX.sub("", key))
+
+    def canonicalize(self, skills: Optional[Iterable[str]]) -> Tuple[List[str], List[int]]:
+        """Maps skills to (names, ids): known skills get their canonical name and ID,
+        unknown ones are kept as written (trimmed). Duplicates are dropped, order is kept.
+        """
+        _, names_by_id = self._current()
+        names, ids, seen = [], [], set()
+        for skill in skills or ():
+            if not isinstance(skill, str) or not skill.strip():
+                continue
+            skill_id = self.lookup(skill)
+            if skill_id is not None:
+                key, name = skill_id, names_by_id[skill_id]
+            else:
+                key, name = fold(skill), " ".join(skill.split())
+            if key in seen:
+                continue
+            seen.add(key)
+            names.append(name)
+            if skill_id is not None:
+                ids.append(skill_id)
+        return names, sorted(ids)
+
+    def key(self, skill: str):
+        """Comparison key: the skill's ID when known, otherwise its folded name."""
+        skill_id = self.lookup(skill)
+        return skill_id if skill_id is not None else fold(skill)
+
+
+vocabulary = SkillVocabulary(SKILLS_VOCABULARY_PATH)
+
+
+async def reindex(batch_size: int = 1000):
+    """Recomputes canonical skill names and IDs for every candidate and vacancy."""
+    from sqlalchemy import bindparam, select, update
+    import models
+    from database import async_session_local
+
+    tables = [
+        (models.Candidate, models.Candidate.skills, "skills", "skill_ids"),
+        (models.Vacancy, models.Vacancy.requirements_skills, "requirements_skills", "requirement_skill_ids"),
+    ]
+    async with async_session_local() as db:
+        for model, skills_column, names_attr, ids_attr in tables:
+            table = model.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values({names_attr: bindparam("names"), ids_attr: bindparam("ids")})
+            )
+            result = await db.stream(select(model.id, skills_column).execution_options(yield_per=batch_size))
+            total = 0
+            async for rows in result.partitions():
+                params = []
+                for row_id, skills in rows:
+                    names, ids = vocabulary.canonicalize(skills if isinstance(skills, list) else [])
+                    params.append({"row_id": row_id, "names": names, "ids": ids})
+                # A separate session: the streaming one holds its cursor open
+                async with async_session_local() as writer:
+                    await writer.execute(stmt, params)
+                    await writer.commit()
+                total += len(params)
+                logger.info("Reindexed skills of %d %s", total, table.name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Skill vocabulary maintenance.")
+    parser.add_argument("--reindex", action="store_true", help="Recompute stored skill names and IDs.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    if args.reindex:
+        asyncio.run(reindex(args.batch_size))
+    else:
+        parser.print_help()
@@ -0,0 +1,103 @@
+# tests/test_candidate_dedup.py
+"""Duplicate detection: which resumes count as the same candidate, and how a
+cluster of duplicates is merged."""
+from datetime import datetime
+from sqlalchemy import func, insert, select
+import candidate_dedup, crud, models
+from database import async_session_local
+
+EXPERIENCE = [
+    {"position": "Backend Developer", "company": "Acme", "description": "Django services, PostgreSQL tuning, Celery queues"},
+    {"position": "Python Developer", "company": "Initech", "description": "ETL pipelines on Airflow and ClickHouse"},
+]
+
+
+def _row(url=None, experience=None, skills=("Python", "SQL"), name="Python Developer") -> dict:
+    row = {"name": name, "skills": list(skills), "experience": experience, "main_url": url, "status": "New"}
+    row.update(candidate_dedup.fingerprints(row))
+    return row
+
+
+def test_resume_without_experience_has_no_content_fingerprint():
+    assert candidate_dedup.fingerprints({"name": "Python Developer", "skills": ["Python", "SQL"]})["fingerprint"] is None
+    assert _row(experience=EXPERIENCE)["fingerprint"] is not None
+
+
+def test_different_resumes_with_common_skills_are_kept():
+    rows = [_row("https://hh.ru/resume/aaa"), _row("https://hh.ru/resume/bbb")]
+    assert candidate_dedup.collapse_rows(rows) == rows
+
+
+def test_same_url_collapses_into_the_later_row():
+    first, second = _row("https://hh.ru/resume/aaa"), _row("https://hh.ru/resume/aaa?from=search", name="Senior Python Developer")
+    assert candidate_dedup.collapse_rows([first, second]) == [second]
+
+
+def test_edited_resume_collapses_and_keeps_its_url():
+    edited = EXPERIENCE + [{"position": "Intern", "company": "Globex", "description": "Scripts"}]
+    first, second = _row("https://hh.ru/resume/aaa", EXPERIENCE), _row(None, edited)
+    [kept] = candidate_dedup.collapse_rows([first, second])
+    assert kept["experience"] == edited
+    assert kept["url_key"] == first["url_key"] and kept["main_url"] == first["main_url"]
+
+
+def test_same_content_under_different_urls_is_kept():
+    rows = [_row("https://hh.ru/resume/aaa", EXPERIENCE), _row(None, EXPERIENCE), _row("https://hh.ru/resume/bbb", EXPERIENCE)]
+    kept = candidate_dedup.collapse_rows(rows)
+    # The URL-less copy joins one of them, but never bridges the two resumes
+    assert sorted(row["url_key"] for row in kept) == sorted([rows[0]["url_key"], rows[2]["url_key"]])
+
+
+async def _store(*rows) -> list:
+    async with async_session_local() as db:
+        ids = [(await db.execute(insert(models.Candidate).values(**row).returning(models.Candidate.id))).scalar_one() for row in rows]
+        await db.commit()
+    return ids
+
+
+def test_match_existing_ignores_content_matches_with_another_url(run_db):
+    async def body():
+        stored_id, _ = await _store(_row("https://hh.ru/resume/aaa", EXPERIENCE), _row("https://hh.ru/resume/ccc"))
+        async with async_session_local() as db:
+            return stored_id, await candidate_dedup.match_existing(db, [
+                _row("https://hh.ru/resume/aaa", EXPERIENCE[:1]),  # same URL
+                _row(None, EXPERIENCE),  # same content, no URL
+                _row("https://hh.ru/resume/bbb", EXPERIENCE),  # same content, another URL
+                _row("https://hh.ru/resume/ddd"),  # common skills, no experience
+            ])
+
+    stored_id, matches = run_db(body)
+    assert matches == [stored_id, stored_id, None, None]
+
+
+def test_merge_candidates_takes_status_and_vacancy_from_the_same_member(run_db):
+    async def body():
+        async with async_session_local() as db:
+            vacancy_ids = [
+                (await db.execute(insert(models.Vacancy).values(title=title, status="Open").returning(models.Vacancy.id))).scalar_one()
+                for title in ("Backend Developer", "Data Engineer")
+            ]
+            await db.commit()
+        oldest, progressed, newest = await _store(
+            {**_row("https://hh.ru/resume/aaa", EXPERIENCE), "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1)},
+            {**_row(None, EXPERIENCE), "status": "Interview Scheduled", "vacancy_id": vacancy_ids[0],
+             "created_at": datetime(2024, 2, 1), "updated_at": datetime(2024, 2, 1)},
+            {**_row(None, EXPERIENCE, name="Senior Python Developer"), "vacancy_id": vacancy_ids[1],
+             "created_at": datetime(2024, 3, 1), "updated_at": datetime(2024, 3, 1)},
+        )
+        async with async_session_local() as db:
+            await db.execute(insert(models.Interview).values(candidate_id=progressed, vacancy_id=vacancy_ids[0], interview_name="Tech"))
+            await db.commit()
+            await crud.merge_candidates(db, [[oldest, progressed, newest]])
+        async with async_session_local() as db:
+            survivor = await db.get(models.Candidate, oldest)
+            remaining = (await db.execute(select(func.count()).select_from(models.Candidate))).scalar_one()
+            interview_owners = (await db.execute(select(models.Interview.candidate_id))).scalars().all()
+        return oldest, vacancy_ids, survivor, remaining, interview_owners
+
+    oldest, vacancy_ids, survivor, remaining, interview_owners = run_db(body)
+    assert remaining == 1
+    assert survivor.name == "Senior Python Developer"
+    assert (survivor.status, survivor.vacancy_id) == ("Interview Scheduled", vacancy_ids[0])
+    assert survivor.main_url == "https://hh.ru/resume/aaa"
+    assert interview_owners == [oldest]
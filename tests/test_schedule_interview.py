@@ -0,0 +1,74 @@
+# tests/test_schedule_interview.py
+"""POST /interviews/schedule runs in one statement (plus COMMIT), counted by a
+before_cursor_execute hook on the engine."""
+import uuid
+from datetime import datetime
+from sqlalchemy import event, func, insert, select
+import crud, models, schemas
+from database import async_session_local, get_engine
+
+QUERY_BUDGET = 1
+
+
+async def _create_candidate_and_vacancy():
+    async with async_session_local() as db:
+        candidate_id = (await db.execute(
+            insert(models.Candidate).values(name="Python Developer", status="New").returning(models.Candidate.id)
+        )).scalar_one()
+        vacancy_id = (await db.execute(
+            insert(models.Vacancy).values(title="Backend Developer", status="Open").returning(models.Vacancy.id)
+        )).scalar_one()
+        await db.commit()
+    return candidate_id, vacancy_id
+
+
+async def _schedule_counting_queries(candidate_id, vacancy_id):
+    request = schemas.InterviewScheduleRequest(
+        candidate_id=candidate_id, vacancy_id=vacancy_id, interview_name="Tech interview",
+        interview_date=datetime(2024, 5, 1, 10, 0), interview_text="We talked about SQL.",
+    )
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = get_engine().sync_engine
+    async with async_session_local() as db:
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            row = await crud.schedule_interview(db, request)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+    return row, len(statements)
+
+
+def test_schedule_interview_is_one_statement(run_db):
+    async def body():
+        candidate_id, vacancy_id = await _create_candidate_and_vacancy()
+        row, query_count = await _schedule_counting_queries(candidate_id, vacancy_id)
+        async with async_session_local() as db:
+            candidate = await db.get(models.Candidate, candidate_id)
+        return row, query_count, candidate, candidate_id, vacancy_id
+
+    row, query_count, candidate, candidate_id, vacancy_id = run_db(body)
+    assert query_count == QUERY_BUDGET
+    assert row is not None and row.candidate_id == candidate_id
+    assert row.analysis_status == crud.ANALYSIS_PENDING
+    assert candidate.status == "Interview Scheduled"
+    assert candidate.vacancy_id == vacancy_id
+
+
+def test_schedule_interview_with_missing_vacancy_writes_nothing(run_db):
+    async def body():
+        candidate_id, _ = await _create_candidate_and_vacancy()
+        row, query_count = await _schedule_counting_queries(candidate_id, uuid.uuid4())
+        async with async_session_local() as db:
+            interviews = (await db.execute(select(func.count()).select_from(models.Interview))).scalar_one()
+            candidate = await db.get(models.Candidate, candidate_id)
+        return row, query_count, interviews, candidate
+
+    row, query_count, interviews, candidate = run_db(body)
+    assert query_count == QUERY_BUDGET
+    assert row is None
+    assert interviews == 0
+    assert candidate.status == "New"
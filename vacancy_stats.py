@@ -0,0 +1,240 @@
+# vacancy_stats.py
+"""Per-vacancy interview aggregates: funnel counts, score distribution, aspect ratings.
+
+The aggregates are counters in the vacancy_stats table, so reading a vacancy's
+stats is one primary-key range scan however many interviews it has. Writers
+keep them current with deltas in the same transaction as the analysis write
+(see crud.complete_analysis / crud.store_analyses / crud.schedule_interview);
+a periodic rebuild corrects any drift without blocking them:
+
+    python -m vacancy_stats --rebuild [--vacancy-id ID]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional
+from sqlalchemy import cast, delete, func, literal, null, select, union_all
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+from database import async_session_local
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full rebuilds run by the API process; 0 leaves them to the CLI / cron
+VACANCY_STATS_REBUILD_SECONDS = float(os.getenv("VACANCY_STATS_REBUILD_SECONDS", "0"))
+
+# Numeric value of each assessment rating for the per-aspect average ("Not Assessed" is left out)
+RATING_SCORES = {"Excellent": 3, "Good": 2, "Needs Improvement": 1}
+
+# Arbitrary key of the advisory lock that keeps rebuilds from overlapping
+_REBUILD_LOCK_KEY = 0x7661636e
+
+def _score_bucket(score: float) -> str:
+    low = min(int(score) // 10, 9) * 10
+    return f"{low}-{low + 9 if low < 90 else 100}"
+
+def contributions(analysis: Optional[dict]) -> Counter:
+    """The (metric, key) counters one interview analysis adds to its vacancy's stats."""
+    counters = Counter()
+    if not analysis:
+        return counters
+    counters[("funnel", "analyzed")] += 1
+    if analysis.get("red_flags_identified"):
+        counters[("funnel", "red_flagged")] += 1
+    score = analysis.get("overall_score")
+    if isinstance(score, (int, float)):
+        score = max(0, min(100, score))
+        counters[("score", "count")] += 1
+        counters[("score", "sum")] += score
+        counters[("score_histogram", _score_bucket(score))] += 1
+    for aspect, rating in (analysis.get("assessment_aspects") or {}).items():
+        counters[(f"aspect_rating:{rating}", aspect)] += 1
+        if rating in RATING_SCORES:
+            counters[("aspect_sum", aspect)] += RATING_SCORES[rating]
+            counters[("aspect_count", aspect)] += 1
+    return counters
+
+
+async def lock_analyses(db: AsyncSession, interview_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, tuple]:
+    """Locks the interviews about to get a new analysis and returns {id: (vacancy_id, old analysis)}.
+
+    Rows are locked in id order so concurrent writers cannot deadlock.
+    """
+    interview = models.Interview
+    result = await db.execute(
+        select(interview.id, interview.vacancy_id, interview.interview_analysis)
+        .where(interview.id.in_(list(interview_ids)))
+        .order_by(interview.id)
+        .with_for_update()
+    )
+    return {row.id: (row.vacancy_id, row.interview_analysis) for row in result}
+
+def analysis_deltas(previous: Dict[uuid.UUID, tuple], new_analyses: Dict[uuid.UUID, dict]) -> Dict[uuid.UUID, Counter]:
+    """Per-vacancy counter changes from replacing each interview's old analysis with its new one."""
+    deltas = defaultdict(Counter)
+    for interview_id, analysis in new_analyses.items():
+        if interview_id not in previous:
+            continue
+        vacancy_id, old_analysis = previous[interview_id]
+        deltas[vacancy_id].update(contributions(analysis))
+        deltas[vacancy_id].subtract(contributions(old_analysis))
+    return deltas
+
+def _upsert(table):
+    stmt = pg_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.vacancy_id, table.c.metric, table.c.key],
+        set_={"value": table.c.value + stmt.excluded.value},
+    )
+
+async def apply_deltas(db: AsyncSession, deltas: Dict[uuid.UUID, Counter]):
+    """Adds the deltas to the stored counters in one executemany upsert (no commit)."""
+    rows = [
+        {"vacancy_id": vacancy_id, "metric": metric, "key": key, "value": float(value)}
+        for vacancy_id, counters in deltas.items()
+        for (metric, key), value in counters.items()
+        if value
+    ]
+    if rows:
+        # A fixed order keeps concurrent upserts on the same vacancy from deadlocking
+        rows.sort(key=lambda row: (str(row["vacancy_id"]), row["metric"], row["key"]))
+        await db.execute(_upsert(models.VacancyStat.__table__), rows)
+
+def scheduled_increment(vacancy_id: uuid.UUID, source):
+    """INSERT ... SELECT adding 1 to the vacancy's scheduled count for each row of `source`.
+
+    Used as a CTE of crud.schedule_interview's statement.
+    """
+    table = models.VacancyStat.__table__
+    selected = select(
+        literal(vacancy_id, table.c.vacancy_id.type), literal("funnel", table.c.metric.type),
+        literal("scheduled", table.c.key.type), literal(1.0, table.c.value.type),
+    ).select_from(source)
+    return _upsert(table).from_select(["vacancy_id", "metric", "key", "value"], selected)
+
+
+async def get_stats(db: AsyncSession, vacancy_id: uuid.UUID) -> dict:
+    stat = models.VacancyStat
+    result = await db.execute(select(stat.metric, stat.key, stat.value).where(stat.vacancy_id == vacancy_id))
+    counters = {(metric, key): value for metric, key, value in result}
+
+    histogram = {key: int(value) for (metric, key), value in counters.items() if metric == "score_histogram" and value}
+    aspects = defaultdict(lambda: {"average": None, "ratings": {}})
+    for (metric, key), value in counters.items():
+        if metric.startswith("aspect_rating:") and value:
+            aspects[key]["ratings"][metric.split(":", 1)[1]] = int(value)
+        elif metric == "aspect_count" and value:
+            aspects[key]["average"] = round(counters.get(("aspect_sum", key), 0) / value, 3)
+
+    score_count = counters.get(("score", "count"), 0)
+    return {
+        "vacancy_id": vacancy_id,
+        "funnel": {
+            "scheduled": int(counters.get(("funnel", "scheduled"), 0)),
+            "analyzed": int(counters.get(("funnel", "analyzed"), 0)),
+            "red_flagged": int(counters.get(("funnel", "red_flagged"), 0)),
+        },
+        "score": {
+            "count": int(score_count),
+            "average": round(counters.get(("score", "sum"), 0) / score_count, 2) if score_count else None,
+            "histogram": dict(sorted(histogram.items(), key=lambda item: int(item[0].split("-")[0]))),
+        },
+        "aspects": dict(aspects),
+    }
+
+
+async def rebuild(vacancy_id: Optional[uuid.UUID] = None, batch_size: int = 2000) -> bool:
+    """Recomputes the counters from the interviews (of one vacancy, or all). Returns False if
+    another rebuild holds the lock.
+
+    Writers are never blocked. One statement reads the interviews and the stored
+    counters from the same snapshot; the difference between the recomputed and the
+    stored counters is then added with the writers' own upsert. Deltas committed by
+    writers meanwhile are already in the stored counters and commute with the
+    correction, so nothing is lost. The advisory lock keeps two rebuilds from applying
+    the same correction twice.
+    """
+    interview = models.Interview
+    table = models.VacancyStat.__table__
+    interviews = select(
+        interview.vacancy_id, interview.interview_analysis.label("analysis"),
+        cast(null(), table.c.metric.type).label("metric"), cast(null(), table.c.key.type).label("key"),
+        cast(null(), table.c.value.type).label("value"),
+    )
+    stored = select(
+        table.c.vacancy_id, cast(null(), JSONB).label("analysis"), table.c.metric, table.c.key, table.c.value,
+    )
+    if vacancy_id:
+        interviews = interviews.where(interview.vacancy_id == vacancy_id)
+        stored = stored.where(table.c.vacancy_id == vacancy_id)
+
+    async with async_session_local() as db:
+        locked = await db.execute(select(func.pg_try_advisory_xact_lock(_REBUILD_LOCK_KEY)))
+        if not locked.scalar():
+            return False
+
+        corrections = defaultdict(Counter)
+        result = await db.stream(union_all(interviews, stored).execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            for row in rows:
+                counters = corrections[row.vacancy_id]
+                if row.metric is None:
+                    counters[("funnel", "scheduled")] += 1
+                    counters.update(contributions(row.analysis))
+                else:
+                    counters[(row.metric, row.key)] -= row.value
+
+        await apply_deltas(db, corrections)
+        wipe = delete(table).where(table.c.value == 0)
+        if vacancy_id:
+            wipe = wipe.where(table.c.vacancy_id == vacancy_id)
+        await db.execute(wipe)
+        await db.commit()
+    drifted = sum(1 for counters in corrections.values() if any(counters.values()))
+    logger.info("Rebuilt stats of %d vacancies; %d had drifted", len(corrections), drifted)
+    return True
+
+async def rebuild_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await rebuild()
+        except Exception as e:
+            logger.error("Vacancy stats rebuild failed: %s", e)
+
+
+class PeriodicRebuild:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, interval: float):
+        if self.task is None and interval > 0:
+            self.task = asyncio.create_task(rebuild_forever(interval))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+periodic_rebuild = PeriodicRebuild()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-vacancy interview stats maintenance.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the stats from the interviews.")
+    parser.add_argument("--vacancy-id", type=uuid.UUID, help="Only rebuild this vacancy.")
+    args = parser.parse_args()
+    if args.rebuild:
+        if not asyncio.run(rebuild(args.vacancy_id)):
+            print("Another rebuild is running.")
+    else:
+        parser.print_help()